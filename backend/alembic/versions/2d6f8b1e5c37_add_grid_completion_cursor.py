@@ -0,0 +1,70 @@
+"""add grid completion cursor
+
+Revision ID: 2d6f8b1e5c37
+Revises: 5e1b7d9c4a26
+Create Date: 2026-10-18 00:00:00.000000
+
+Numbers the points of each grid simulation in the order that they finish
+(``grid_simulation_points.completion_index``), and counts the finished points
+(``grid_simulations.completed_points``), for incremental grid results. Points
+that have already finished are numbered by position.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "2d6f8b1e5c37"
+down_revision: Union[str, Sequence[str], None] = "5e1b7d9c4a26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "grid_simulations",
+        sa.Column("completed_points", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("grid_simulation_points", sa.Column("completion_index", sa.Integer()))
+
+    op.execute("""
+        UPDATE grid_simulation_points p
+        SET completion_index = numbered.completion_index
+        FROM (
+            SELECT
+                p.id,
+                row_number() OVER (
+                    PARTITION BY p.grid_simulation_id ORDER BY p.position
+                ) AS completion_index
+            FROM grid_simulation_points p
+            JOIN simulations s ON s.id = p.simulation_id
+            WHERE s.status != 'pending'
+        ) numbered
+        WHERE p.id = numbered.id
+    """)
+    op.execute("""
+        UPDATE grid_simulations g
+        SET completed_points = (
+            SELECT count(p.completion_index)
+            FROM grid_simulation_points p
+            WHERE p.grid_simulation_id = g.id
+        )
+    """)
+
+    op.alter_column("grid_simulations", "completed_points", server_default=None)
+    op.create_index(
+        "ix_grid_simulation_points_grid_simulation_id_completion_index",
+        "grid_simulation_points",
+        ["grid_simulation_id", "completion_index"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_grid_simulation_points_grid_simulation_id_completion_index",
+        "grid_simulation_points",
+    )
+    op.drop_column("grid_simulation_points", "completion_index")
+    op.drop_column("grid_simulations", "completed_points")
@@ -0,0 +1,31 @@
+"""add simulation result snapshot
+
+Revision ID: 5e1b7d9c4a26
+Revises: c8d2f6a4e913
+Create Date: 2026-10-18 00:00:00.000000
+
+Adds ``result_snapshot`` and ``result_etag`` to ``simulations``. Finished
+simulations that predate this revision are snapshotted the first time their
+result is requested.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "5e1b7d9c4a26"
+down_revision: Union[str, Sequence[str], None] = "c8d2f6a4e913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("simulations", sa.Column("result_snapshot", sa.Text()))
+    op.add_column("simulations", sa.Column("result_etag", sa.String()))
+
+
+def downgrade() -> None:
+    op.drop_column("simulations", "result_etag")
+    op.drop_column("simulations", "result_snapshot")
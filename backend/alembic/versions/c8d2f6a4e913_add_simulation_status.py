@@ -0,0 +1,74 @@
+"""add simulation status
+
+Revision ID: c8d2f6a4e913
+Revises: f3a9c2d71b58
+Create Date: 2026-10-18 00:00:00.000000
+
+Adds ``status``, ``completed_steps`` and ``total_steps`` to ``simulations``,
+so that progress can be polled without loading the model chain. Existing
+simulations are backfilled from their model inputs and results.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "c8d2f6a4e913"
+down_revision: Union[str, Sequence[str], None] = "f3a9c2d71b58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "simulations",
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+    )
+    op.add_column(
+        "simulations",
+        sa.Column("completed_steps", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "simulations",
+        sa.Column("total_steps", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.execute("""
+        UPDATE simulations s
+        SET
+            total_steps = (
+                SELECT count(*) FROM model_inputs mi WHERE mi.simulation_id = s.id
+            ),
+            completed_steps = (
+                SELECT count(*)
+                FROM model_inputs mi
+                JOIN results r ON r.model_input_id = mi.id
+                WHERE mi.simulation_id = s.id
+            )
+    """)
+    op.execute("""
+        UPDATE simulations s
+        SET status = CASE
+            WHEN EXISTS (
+                SELECT 1
+                FROM model_inputs mi
+                JOIN results r ON r.model_input_id = mi.id
+                WHERE mi.simulation_id = s.id AND r.error IS NOT NULL
+            ) THEN 'error'
+            WHEN s.completed_steps >= s.total_steps THEN 'done'
+            ELSE 'pending'
+        END
+    """)
+
+    for column in ("status", "completed_steps", "total_steps"):
+        op.alter_column("simulations", column, server_default=None)
+    op.create_index("ix_simulations_status", "simulations", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_simulations_status", "simulations")
+    op.drop_column("simulations", "total_steps")
+    op.drop_column("simulations", "completed_steps")
+    op.drop_column("simulations", "status")
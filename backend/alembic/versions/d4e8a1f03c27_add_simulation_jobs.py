@@ -0,0 +1,44 @@
+"""add simulation jobs
+
+Revision ID: d4e8a1f03c27
+Revises: a7f3c9d21b84
+Create Date: 2026-10-18 00:00:00.000000
+
+Adds the ``simulation_jobs`` table, a persistent queue from which workers
+lease simulations to run. Replaces the in-process background tasks, whose
+work was lost whenever the API process restarted.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "d4e8a1f03c27"
+down_revision: Union[str, Sequence[str], None] = "a7f3c9d21b84"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "simulation_jobs",
+        sa.Column("simulation_id", sa.Uuid(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("lease_owner", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["simulation_id"], ["simulations.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("simulation_id"),
+    )
+    op.create_index("ix_simulation_jobs_status", "simulation_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_simulation_jobs_status", table_name="simulation_jobs")
+    op.drop_table("simulation_jobs")
@@ -0,0 +1,39 @@
+"""add cached results
+
+Revision ID: e9c5b7a2d614
+Revises: d4e8a1f03c27
+Create Date: 2026-10-18 00:00:00.000000
+
+Adds the ``cached_results`` table, which stores successful model output keyed
+on a hash of the model's inputs so that identical runs are not repeated.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "e9c5b7a2d614"
+down_revision: Union[str, Sequence[str], None] = "d4e8a1f03c27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cached_results",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("model_id", sa.String(), nullable=False),
+        sa.Column("phases", sa.JSON(), nullable=False),
+        sa.Column("panels", sa.JSON(), nullable=False),
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("cached_results")
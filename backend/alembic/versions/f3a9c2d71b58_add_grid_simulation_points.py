@@ -0,0 +1,105 @@
+"""add grid simulation points
+
+Revision ID: f3a9c2d71b58
+Revises: e9c5b7a2d614
+Create Date: 2026-10-18 00:00:00.000000
+
+Replaces the ``simulation_ids`` JSON list on ``grid_simulations`` with the
+``grid_simulation_points`` table, which references each member simulation and
+records its position and axis coordinates. Coordinates of existing grids are
+read back from each simulation's input phase.
+
+Also indexes the columns that model chains are looked up by.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "f3a9c2d71b58"
+down_revision: Union[str, Sequence[str], None] = "e9c5b7a2d614"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grid_simulation_points",
+        sa.Column("grid_simulation_id", sa.Uuid(), nullable=False),
+        sa.Column("simulation_id", sa.Uuid(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("coordinates", sa.JSON(), nullable=False),
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["grid_simulation_id"], ["grid_simulations.id"]),
+        sa.ForeignKeyConstraint(["simulation_id"], ["simulations.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("simulation_id"),
+    )
+    op.create_index(
+        "ix_grid_simulation_points_grid_simulation_id_position",
+        "grid_simulation_points",
+        ["grid_simulation_id", "position"],
+        unique=True,
+    )
+
+    op.execute("""
+        INSERT INTO grid_simulation_points (
+            id, created_at, updated_at,
+            grid_simulation_id, simulation_id, position, coordinates
+        )
+        SELECT
+            gen_random_uuid(), g.created_at, g.updated_at,
+            g.id, s.id, member.ordinality - 1,
+            (
+                SELECT json_agg(
+                    s.phases::jsonb -> 0 -> 'concentrations'
+                        -> (axis.value ->> 'substance')
+                    ORDER BY axis.ordinality
+                )
+                FROM jsonb_array_elements(g.axes::jsonb)
+                    WITH ORDINALITY AS axis(value, ordinality)
+            )
+        FROM grid_simulations g
+        CROSS JOIN LATERAL json_array_elements_text(g.simulation_ids)
+            WITH ORDINALITY AS member(value, ordinality)
+        JOIN simulations s ON s.id = member.value::uuid
+    """)
+    op.drop_column("grid_simulations", "simulation_ids")
+
+    op.create_index("ix_model_inputs_simulation_id", "model_inputs", ["simulation_id"])
+    op.create_index(
+        "ix_model_inputs_previous_model_input_id",
+        "model_inputs",
+        ["previous_model_input_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_model_inputs_previous_model_input_id", "model_inputs")
+    op.drop_index("ix_model_inputs_simulation_id", "model_inputs")
+
+    op.add_column(
+        "grid_simulations", sa.Column("simulation_ids", sa.JSON(), nullable=True)
+    )
+    op.execute("""
+        UPDATE grid_simulations g
+        SET simulation_ids = COALESCE(
+            (
+                SELECT json_agg(p.simulation_id::text ORDER BY p.position)
+                FROM grid_simulation_points p
+                WHERE p.grid_simulation_id = g.id
+            ),
+            '[]'::json
+        )
+    """)
+    op.alter_column("grid_simulations", "simulation_ids", nullable=False)
+
+    op.drop_index(
+        "ix_grid_simulation_points_grid_simulation_id_position",
+        "grid_simulation_points",
+    )
+    op.drop_table("grid_simulation_points")
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import io
-import time
 from uuid import UUID
 from pydantic.alias_generators import to_camel
 from pydantic import BaseModel, ConfigDict, RootModel, Field
@@ -72,6 +71,10 @@ class SimulationResultPending(BaseModel):
     status: Literal["pending"]
 
 
+class _SimulationStatus(BaseModel):
+    status: Literal["done", "pending", "error"]
+
+
 _SimulationResult = RootModel[
     Annotated[
         SimulationResult | SimulationResultPending,
@@ -100,6 +103,37 @@ class Client(httpx.Client):
         assert resp.status_code == 200
         return Models.model_validate_json(resp.content)
 
+    def _wait_for_simulation(self, simulation_id: UUID) -> bool:
+        """Follow the simulation's event stream until it has finished
+
+        Returns:
+            Whether the simulation finished before the stream was closed.
+
+        """
+        # The server sends a keep-alive comment at least every 15 seconds
+        timeout = httpx.Timeout(5.0, read=60.0)
+        # Only the status events are used, so leave the panels out of the results
+        with self.stream(
+            "GET",
+            f"/simulations/{simulation_id}/events",
+            params={"panels": "descriptors"},
+            timeout=timeout,
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError("Couldn't follow model run", response.read())
+
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line.removeprefix("event:").strip()
+                elif line.startswith("data:") and event == "status":
+                    status = _SimulationStatus.model_validate_json(
+                        line.removeprefix("data:")
+                    )
+                    if status.status != "pending":
+                        return True
+        return False
+
     def run_model(
         self,
         model_id: str,
@@ -108,7 +142,9 @@ class Client(httpx.Client):
         *,
         temperature: float = 25,
         pressure: float = 10,
-        retries: int = 9999,
+        retries: Annotated[
+            int, Doc("Number of times to reconnect to the simulation's events")
+        ] = 10,
     ) -> pd.DataFrame:
         response = self.post(
             "/simulations",
@@ -133,23 +169,23 @@ class Client(httpx.Client):
         simulation_id = UUID(response.json())
 
         for _ in range(retries):
-            response = self.get(f"/simulations/{simulation_id}/result")
-            if response.status_code != 200:
-                raise RuntimeError("Couldn't poll model run", response.json())
+            if self._wait_for_simulation(simulation_id):
+                break
+        else:
+            raise RuntimeError("Out of retries")
 
-            res = _SimulationResult.model_validate_json(response.content)
-            if isinstance(res.root, SimulationResult):
-                substances: set[str] = set()
-                for r in res.root.results:
-                    substances |= set(r.concentrations.keys())
+        response = self.get(f"/simulations/{simulation_id}/result")
+        if response.status_code != 200:
+            raise RuntimeError("Couldn't get model run result", response.json())
 
-                return pd.DataFrame(
-                    {
-                        s: [r.concentrations[s] for r in res.root.results]
-                        for s in substances
-                    }
-                )
+        res = _SimulationResult.model_validate_json(response.content)
+        if not isinstance(res.root, SimulationResult):
+            raise RuntimeError("Model run did not finish", response.json())
 
-            time.sleep(0.5)
+        substances: set[str] = set()
+        for r in res.root.results:
+            substances |= set(r.concentrations.keys())
 
-        raise RuntimeError("Out of retries")
+        return pd.DataFrame(
+            {s: [r.concentrations[s] for r in res.root.results] for s in substances}
+        )
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import fastapi
 from azure.monitor.opentelemetry import configure_azure_monitor
@@ -12,12 +15,16 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 from opentelemetry.trace import get_tracer_provider
 
-from acidwatch_api.database import lifespan
+from acidwatch_api import jobs
+from acidwatch_api.state import AppState, open_state
 from acidwatch_api.settings import SETTINGS
 from acidwatch_api.authentication import (
     swagger_ui_init_oauth_config,
 )
+from acidwatch_api.model_catalogue import build_catalogue
 from acidwatch_api.routes import router
+from acidwatch_api.routes.models import get_adapters
+from acidwatch_api.worker import work
 
 logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
@@ -28,6 +35,40 @@ logging.basicConfig(
 
 tracer = trace.get_tracer(__name__, tracer_provider=get_tracer_provider())
 
+
+async def _resume_orphaned_jobs(state: AppState) -> None:
+    """Run the jobs that were left over when an API process stopped
+
+    New jobs are run by the requests that enqueue them.
+    """
+    # Jobs orphaned by a restart only become claimable once their lease has
+    # expired, so there is no hurry
+    await asyncio.sleep(SETTINGS.acidwatch_job_poll_seconds)
+    await work(
+        state,
+        jobs.worker_id(),
+        SETTINGS.acidwatch_job_poll_seconds,
+        orphaned_only=True,
+    )
+
+
+@asynccontextmanager
+async def lifespan(_: fastapi.FastAPI) -> AsyncIterator[AppState]:
+    # Serialize the static part of GET /models before serving requests
+    build_catalogue(tuple(get_adapters().values()))
+    async with open_state() as state:
+        if not SETTINGS.acidwatch_inline_worker:
+            yield state
+            return
+
+        job_loop = asyncio.create_task(_resume_orphaned_jobs(state))
+        try:
+            yield state
+        finally:
+            job_loop.cancel()
+            await asyncio.gather(job_loop, return_exceptions=True)
+
+
 fastapi_app = fastapi.FastAPI(
     title=f"AcidWatch API ({SETTINGS.acidwatch_env})",
     swagger_ui_init_oauth=swagger_ui_init_oauth_config,
@@ -1,8 +1,11 @@
 from __future__ import annotations
 from dataclasses import dataclass
+import asyncio
+import hashlib
 import logging
 import os
-from typing import Annotated, Any, TypeAlias, TypedDict
+import time
+from typing import Annotated, Any, AsyncGenerator, TypeAlias, TypedDict
 import httpx
 import jwt
 import msal  # type: ignore
@@ -11,6 +14,7 @@ from fastapi import Depends, HTTPException, Security
 from fastapi.security import OAuth2AuthorizationCodeBearer
 
 from acidwatch_api.settings import SETTINGS
+from acidwatch_api.single_flight import SingleFlight
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 logger = logging.getLogger(__name__)
@@ -110,14 +114,88 @@ confidential_app = msal.ConfidentialClientApplication(
 )
 
 
-def acquire_token_for_downstream_api(scope: str, jwt_token: str) -> str:
-    result = confidential_app.acquire_token_on_behalf_of(
-        user_assertion=jwt_token, scopes=[scope]
-    )
+# Cached tokens are renewed this long before they expire, so that a token is
+# still valid when the downstream API receives it
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class _CachedToken:
+    result: dict[str, Any]
+    expires_at: float
+
+
+class OnBehalfOfTokens:
+    """Cache of on-behalf-of tokens, keyed by user assertion and scope
+
+    MSAL acquires tokens with a blocking network request to Entra ID, which is
+    made in a thread so that it does not block the event loop. Concurrent
+    requests for the same token share one acquisition.
+    """
+
+    def __init__(self, app: msal.ConfidentialClientApplication) -> None:
+        self._app = app
+        self._tokens: dict[tuple[str, str], _CachedToken] = {}
+        self._in_flight: SingleFlight[dict[str, Any]] = SingleFlight()
+
+    async def acquire(self, scope: str, jwt_token: str) -> dict[str, Any]:
+        """Get the MSAL result, which contains either 'access_token' or 'error'"""
+        key = (hashlib.sha256(jwt_token.encode()).hexdigest(), scope)
+        cached = self._tokens.get(key)
+        if cached is not None and cached.expires_at > time.monotonic():
+            return cached.result
+
+        result, _ = await self._in_flight.run(
+            ":".join(key), lambda: self._acquire(key, scope, jwt_token)
+        )
+        return result
+
+    async def _acquire(
+        self, key: tuple[str, str], scope: str, jwt_token: str
+    ) -> dict[str, Any]:
+        result: dict[str, Any] = await asyncio.to_thread(
+            self._app.acquire_token_on_behalf_of,
+            user_assertion=jwt_token,
+            scopes=[scope],
+        )
+        if "access_token" not in result:
+            return result
+
+        now = time.monotonic()
+        self._tokens = {k: v for k, v in self._tokens.items() if v.expires_at > now}
+        self._tokens[key] = _CachedToken(
+            result=result,
+            expires_at=now
+            + float(result.get("expires_in", 0))
+            - TOKEN_REFRESH_MARGIN_SECONDS,
+        )
+        return result
+
+
+obo_tokens = OnBehalfOfTokens(confidential_app)
+
+
+async def acquire_token_for_downstream_api(scope: str, jwt_token: str) -> str:
+    result = await obo_tokens.acquire(scope, jwt_token)
     if "error" in result:
         logger.error(result["error"])
         raise HTTPException(401, result["error_description"])
-    return result["access_token"]  # type: ignore
+    return result["access_token"]  # type: ignore[no-any-return]
+
+
+class OnBehalfOfAuth(httpx.Auth):
+    """Authenticate requests to a downstream API as the user"""
+
+    def __init__(self, scope: str, jwt_token: str) -> None:
+        self._scope = scope
+        self._jwt_token = jwt_token
+
+    async def async_auth_flow(
+        self, request: httpx.Request
+    ) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        token = await acquire_token_for_downstream_api(self._scope, self._jwt_token)
+        request.headers["Authorization"] = f"Bearer {token}"
+        yield request
 
 
 @dataclass
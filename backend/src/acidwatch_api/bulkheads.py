@@ -0,0 +1,83 @@
+"""Per-model concurrency limits.
+
+Each adapter may declare how many runs it can handle at the same time
+(``BaseAdapter.max_concurrency``) and how many runs may wait for a free slot
+(``BaseAdapter.max_queue``). The limits apply to all simulations in a process,
+so one large grid cannot saturate a remote model or the JVM on its own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+    from acidwatch_api.models.base import BaseAdapter
+
+
+class BulkheadFull(RuntimeError):
+    pass
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int | None) -> None:
+        self.name = name
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the model's run slots, waiting for one if necessary
+
+        Raises:
+            BulkheadFull: If all slots are taken and the queue is full.
+
+        """
+        if (
+            self._semaphore.locked()
+            and self.max_queue is not None
+            and self._waiting >= self.max_queue
+        ):
+            raise BulkheadFull(
+                f"Model '{self.name}' is at capacity, please try again later"
+            )
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class Bulkheads:
+    """Registry of bulkheads, one per model that declares a limit"""
+
+    def __init__(self) -> None:
+        self._bulkheads: dict[str, Bulkhead] = {}
+
+    @asynccontextmanager
+    async def slot(self, adapter: BaseAdapter) -> AsyncIterator[None]:
+        if adapter.max_concurrency is None:
+            yield
+            return
+
+        bulkhead = self._bulkheads.get(adapter.model_id)
+        if bulkhead is None:
+            bulkhead = Bulkhead(
+                adapter.model_id, adapter.max_concurrency, adapter.max_queue
+            )
+            self._bulkheads[adapter.model_id] = bulkhead
+
+        async with bulkhead.slot():
+            yield
@@ -0,0 +1,99 @@
+"""The columnar representation of grid simulation results.
+
+``GridSimulationResult`` repeats the input and the structure of every phase
+for each point. ``ColumnarGridSimulationResult`` has them once, with one array
+per phase and substance of each model step, holding a value for each point.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import acidwatch_api.database as db
+from acidwatch_api.models.datamodel import (
+    Axis,
+    ColumnarGridSimulationResult,
+    Conditions,
+    ModelInput,
+    PhaseColumns,
+    StepColumns,
+)
+
+type Chain = list[tuple[db.ModelInput, db.ModelResult | None]]
+
+
+class _StepBuilder:
+    def __init__(self, model_id: str, size: int) -> None:
+        self.model_id = model_id
+        self.size = size
+        self.phases: dict[str, PhaseColumns] = {}
+
+    def add(self, index: int, phase: dict[str, Any]) -> None:
+        columns = self.phases.get(phase["kind"])
+        if columns is None:
+            columns = self.phases[phase["kind"]] = PhaseColumns(
+                kind=phase["kind"], fraction=[None] * self.size, concentrations={}
+            )
+        columns.fraction[index] = phase["fraction"]
+        for substance, value in phase["concentrations"].items():
+            column = columns.concentrations.get(substance)
+            if column is None:
+                column = columns.concentrations[substance] = [None] * self.size
+            column[index] = value
+
+    def build(self) -> StepColumns:
+        return StepColumns(model_id=self.model_id, phases=list(self.phases.values()))
+
+
+def build_columnar_result(
+    axes: list[Axis],
+    cursor: int,
+    coordinates: list[list[float]],
+    simulations: list[db.Simulation],
+    chains: list[Chain],
+) -> ColumnarGridSimulationResult:
+    """Build the columnar result from the rows of the grid's points
+
+    ``coordinates``, ``simulations`` and ``chains`` have one item per point, in
+    order. Chains must be ordered, see ``order_chain``.
+    """
+    size = len(simulations)
+    models = [
+        ModelInput(model_id=model_input.model_id, parameters=model_input.parameters)
+        for model_input, _ in chains[0]
+    ]
+    steps = [_StepBuilder(model.model_id, size) for model in models]
+
+    errors: list[str | None] = []
+    for index, chain in enumerate(chains):
+        error = None
+        for step, (_, result) in zip(steps, chain):
+            if result is None:
+                break
+            if result.error is not None:
+                error = result.error
+                break
+            for phase in result.phases:
+                step.add(index, phase)
+        errors.append(error)
+
+    # Every point shares the input, apart from the axes' substances
+    concentrations: dict[str, int | float] = {}
+    for phase in simulations[0].phases:
+        concentrations.update(phase["concentrations"])
+    for axis in axes:
+        concentrations.pop(axis.substance, None)
+
+    statuses = [simulation.status for simulation in simulations]
+    return ColumnarGridSimulationResult(
+        status="pending" if "pending" in statuses else "done",
+        axes=axes,
+        coordinates=[list(values) for values in zip(*coordinates)],
+        concentrations=concentrations,
+        conditions=Conditions(**(simulations[0].conditions or {})),
+        models=models,
+        statuses=statuses,  # type: ignore[arg-type]
+        errors=errors,
+        steps=[step.build() for step in steps],
+        cursor=cursor,
+    )
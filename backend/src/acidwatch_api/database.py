@@ -2,18 +2,19 @@ from __future__ import annotations
 
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Annotated, Any, TypeAlias, TypedDict, AsyncIterator
+from typing import Annotated, Any, TypeAlias, AsyncIterator
 from uuid import UUID, uuid4
 
-from fastapi import Depends, FastAPI, Request
+from fastapi import Depends, Request
 from sqlalchemy import (
-    Engine,
+    URL,
     ForeignKey,
     DateTime,
     Uuid,
     JSON,
-    create_engine,
-    StaticPool,
+    Index,
+    Text,
+    AsyncAdaptedQueuePool,
     make_url,
 )
 from sqlalchemy.orm import (
@@ -21,14 +22,26 @@ from sqlalchemy.orm import (
     Mapped,
     mapped_column,
     relationship,
-    sessionmaker,
-    Session,
 )
-from sqlalchemy.ext.asyncio import AsyncAttrs
+from sqlalchemy.ext.asyncio import (
+    AsyncAttrs,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from acidwatch_api.settings import SETTINGS
 
-SessionMaker: TypeAlias = sessionmaker[Session]
+SessionMaker: TypeAlias = async_sessionmaker[AsyncSession]
+
+# Async drivers to use in place of the default (blocking) ones
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -41,10 +54,20 @@ class Base(AsyncAttrs, DeclarativeBase):
 
 class Simulation(Base):
     __tablename__ = "simulations"
+    __table_args__ = (Index("ix_simulations_status", "status"),)
 
     owner_id: Mapped[UUID | None] = mapped_column(Uuid)
     phases: Mapped[list[dict]] = mapped_column(JSON)
     conditions: Mapped[dict[str, float] | None] = mapped_column(JSON)
+    # Progress of the model chain, kept up to date as results are saved so
+    # that it can be polled without loading the chain
+    status: Mapped[str] = mapped_column(default="pending")
+    completed_steps: Mapped[int] = mapped_column(default=0)
+    total_steps: Mapped[int] = mapped_column(default=0)
+    # Serialized 'SimulationResult' and its ETag, stored once the simulation
+    # is done or has failed, after which the result no longer changes
+    result_snapshot: Mapped[str | None] = mapped_column(Text)
+    result_etag: Mapped[str | None] = mapped_column()
 
     model_inputs: Mapped[list[ModelInput]] = relationship(back_populates="simulation")
 
@@ -54,15 +77,50 @@ class GridSimulation(Base):
 
     owner_id: Mapped[UUID | None] = mapped_column(Uuid)
     axes: Mapped[list[dict]] = mapped_column(JSON)
-    simulation_ids: Mapped[list[str]] = mapped_column(JSON)
+    # Number of points that have finished. Also the 'completion_index' of the
+    # point that finished last.
+    completed_points: Mapped[int] = mapped_column(default=0)
+
+
+class GridSimulationPoint(Base):
+    """A simulation that is one point of a grid simulation"""
+
+    __tablename__ = "grid_simulation_points"
+    __table_args__ = (
+        Index(
+            "ix_grid_simulation_points_grid_simulation_id_position",
+            "grid_simulation_id",
+            "position",
+            unique=True,
+        ),
+        Index(
+            "ix_grid_simulation_points_grid_simulation_id_completion_index",
+            "grid_simulation_id",
+            "completion_index",
+        ),
+    )
+
+    grid_simulation_id: Mapped[UUID] = mapped_column(ForeignKey("grid_simulations.id"))
+    simulation_id: Mapped[UUID] = mapped_column(
+        ForeignKey("simulations.id"), unique=True
+    )
+    # Order of the point in the cartesian product of the axes
+    position: Mapped[int] = mapped_column()
+    # The value of each axis's substance at this point
+    coordinates: Mapped[list[float]] = mapped_column(JSON)
+    # Order in which the point finished, starting at 1. Used as the cursor of
+    # incremental grid results.
+    completion_index: Mapped[int | None] = mapped_column()
 
 
 class ModelInput(Base):
     __tablename__ = "model_inputs"
 
-    simulation_id: Mapped[UUID] = mapped_column(ForeignKey("simulations.id"))
+    simulation_id: Mapped[UUID] = mapped_column(
+        ForeignKey("simulations.id"), index=True
+    )
     previous_model_input_id: Mapped[UUID | None] = mapped_column(
-        ForeignKey("model_inputs.id")
+        ForeignKey("model_inputs.id"), index=True
     )
     model_id: Mapped[str] = mapped_column()
     parameters: Mapped[dict[str, Any]] = mapped_column(JSON)
@@ -85,24 +143,68 @@ class ModelResult(Base):
     model_input: Mapped[ModelInput] = relationship("ModelInput")
 
 
-class AppState(TypedDict):
-    engine: Engine
-    session: SessionMaker
+class CachedResult(Base):
+    """Successful adapter output, keyed on a hash of the adapter's inputs"""
+
+    __tablename__ = "cached_results"
+
+    key: Mapped[str] = mapped_column(unique=True)
+    model_id: Mapped[str] = mapped_column()
+    phases: Mapped[list[dict[str, Any]]] = mapped_column(JSON)
+    panels: Mapped[list[Any]] = mapped_column(JSON)
+
+
+class SimulationJob(Base):
+    """A queued run of a simulation's model chain.
+
+    Jobs are claimed by a worker through a lease that the worker keeps alive
+    with heartbeats. If the worker dies, the lease expires and the job is
+    picked up again by another worker, which resumes the chain from the
+    first step without a result.
+
+    The user's token is not stored. Only the request that enqueued the job can
+    run authenticated models on their behalf, so they fail when resumed.
+    """
+
+    __tablename__ = "simulation_jobs"
+    __table_args__ = (Index("ix_simulation_jobs_status", "status"),)
+
+    simulation_id: Mapped[UUID] = mapped_column(
+        ForeignKey("simulations.id"), unique=True
+    )
+    status: Mapped[str] = mapped_column(default="queued")
+    attempts: Mapped[int] = mapped_column(default=0)
+    lease_owner: Mapped[str | None] = mapped_column()
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime)
+
+
+def async_database_url(database: str) -> URL:
+    """Use the async driver for ``ACIDWATCH_DATABASE``
+
+    ``ACIDWATCH_DATABASE`` is also used by alembic, so it may name either the
+    default driver or an async one.
+    """
+    url = make_url(database)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.drivername, url.drivername))
 
 
 @asynccontextmanager
-async def lifespan(_: FastAPI) -> AsyncIterator[AppState]:
+async def open_database() -> AsyncIterator[tuple[AsyncEngine, SessionMaker]]:
     engine_kwargs: dict[str, Any] = {}
 
-    # This is required for in-memory SQLite databases. Otherwise each thread
-    # will create a new in-memory database and everything will be weird.
-    url = make_url(SETTINGS.acidwatch_database)
-    if url.drivername == "sqlite" and url.database in (None, "", ":memory:"):
+    # This is required for in-memory SQLite databases. Otherwise each
+    # connection will create a new in-memory database and everything will be
+    # weird. Sessions take turns using the one connection, so that concurrent
+    # tasks don't interleave their transactions on it.
+    url = async_database_url(SETTINGS.acidwatch_database)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
         engine_kwargs["connect_args"] = {"check_same_thread": False}
-        engine_kwargs["poolclass"] = StaticPool
+        engine_kwargs["poolclass"] = AsyncAdaptedQueuePool
+        engine_kwargs["pool_size"] = 1
+        engine_kwargs["max_overflow"] = 0
 
-    engine = create_engine(
-        SETTINGS.acidwatch_database,
+    engine = create_async_engine(
+        url,
         echo=not SETTINGS.is_production,
         **engine_kwargs,
     )
@@ -110,36 +212,29 @@ async def lifespan(_: FastAPI) -> AsyncIterator[AppState]:
     if engine.name == "sqlite":
         # If we're using SQLite, create all tables at startup
         # For other databases, use alembic migrations
-        Base.metadata.create_all(engine)
-
-    session = sessionmaker(engine, expire_on_commit=False)
-    state: AppState = {
-        "engine": engine,
-        "session": session,
-    }
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
 
     try:
-        yield state
+        yield engine, async_sessionmaker(engine, expire_on_commit=False)
     finally:
-        engine.dispose()
+        await engine.dispose()
 
 
 @asynccontextmanager
-async def begin_session(s: SessionMaker) -> AsyncIterator[Session]:
-    with s() as session:
+async def begin_session(s: SessionMaker) -> AsyncIterator[AsyncSession]:
+    async with s() as session:
         try:
             yield session
-            session.commit()
+            await session.commit()
         except:
-            session.rollback()
+            await session.rollback()
             raise
-        finally:
-            session.close()
 
 
-async def get_db(request: Request) -> AsyncIterator[Session]:
+async def get_db(request: Request) -> AsyncIterator[AsyncSession]:
     async with begin_session(request.state.session) as session:
         yield session
 
 
-GetDB: TypeAlias = Annotated[Session, Depends(get_db)]
+GetDB: TypeAlias = Annotated[AsyncSession, Depends(get_db)]
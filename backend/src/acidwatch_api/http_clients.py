@@ -0,0 +1,79 @@
+"""Shared HTTP clients for remote models.
+
+Creating an ``httpx.AsyncClient`` per request means a new TCP and TLS
+handshake for every model run, and leaks sockets unless the client is closed.
+Instead, one client with a keep-alive connection pool is shared per base URL
+for the whole process. The clients are closed when the application shuts
+down and are recreated on demand.
+
+Clients carry no credentials. Authentication is per request, as each run is
+made on behalf of a different user.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import httpx
+
+from acidwatch_api.settings import SETTINGS
+
+
+class ModelClient:
+    """A shared client, authenticating its requests as the current user"""
+
+    def __init__(self, client: httpx.AsyncClient, auth: httpx.Auth | None) -> None:
+        self._client = client
+        self._auth = auth
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        if self._auth is not None:
+            kwargs.setdefault("auth", self._auth)
+        return await self._client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+
+class HttpClients:
+    """Registry of shared clients, one per base URL"""
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=SETTINGS.acidwatch_http_max_connections,
+                max_keepalive_connections=(
+                    SETTINGS.acidwatch_http_max_keepalive_connections
+                ),
+                keepalive_expiry=SETTINGS.acidwatch_http_keepalive_expiry,
+            )
+            client = httpx.AsyncClient(
+                base_url=base_url, http2=SETTINGS.acidwatch_http2, limits=limits
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+HTTP_CLIENTS = HttpClients()
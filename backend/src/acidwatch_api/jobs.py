@@ -0,0 +1,143 @@
+"""Persistent queue of simulation jobs.
+
+Every submitted simulation gets a ``db.SimulationJob`` row. Workers (either
+the API process itself or a dedicated ``acidwatch-api-worker``) lease jobs
+from the table and keep the lease alive with heartbeats while running them.
+A job whose lease has expired is considered abandoned and can be claimed by
+any worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Literal, cast
+from uuid import UUID, uuid4
+
+from sqlalchemy import ColumnElement, CursorResult, or_, select, update
+
+import acidwatch_api.database as db
+from acidwatch_api.database import SessionMaker
+from acidwatch_api.settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+type JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class LeaseLost(Exception):
+    """Another worker has taken over a job that was being run"""
+
+
+def worker_id() -> str:
+    """Identify this process as the owner of a lease"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _lease_expiry(now: datetime) -> datetime:
+    return now + timedelta(seconds=SETTINGS.acidwatch_job_lease_seconds)
+
+
+def _is_claimable(now: datetime) -> ColumnElement[bool]:
+    return or_(
+        db.SimulationJob.status == "queued",
+        (db.SimulationJob.status == "running")
+        & (db.SimulationJob.lease_expires_at < now),
+    )
+
+
+def new_job_values(simulation_id: UUID) -> dict[str, Any]:
+    """Column values of a new job, for bulk inserts"""
+    return {
+        "id": uuid4(),
+        "simulation_id": simulation_id,
+        "status": "queued",
+        "attempts": 0,
+    }
+
+
+def new_job(simulation_id: UUID) -> db.SimulationJob:
+    return db.SimulationJob(**new_job_values(simulation_id))
+
+
+async def claim_job(
+    sessionmaker: SessionMaker,
+    owner: str,
+    job_id: UUID | None = None,
+    orphaned_only: bool = False,
+) -> db.SimulationJob | None:
+    """Lease the oldest claimable job to ``owner``.
+
+    The lease is taken with a conditional ``UPDATE`` so that concurrent
+    workers never claim the same job, regardless of database backend.
+
+    Args:
+        job_id: If given, only this job is considered.
+        orphaned_only: Skip jobs that were queued less than a lease ago, which
+            the API process that enqueued them is about to claim itself.
+
+    """
+    async with db.begin_session(sessionmaker) as session:
+        now = datetime.now()
+        query = (
+            select(db.SimulationJob.id)
+            .where(_is_claimable(now))
+            .order_by(db.SimulationJob.created_at)
+            .limit(10)
+        )
+        if job_id is not None:
+            query = query.where(db.SimulationJob.id == job_id)
+        if orphaned_only:
+            lease = timedelta(seconds=SETTINGS.acidwatch_job_lease_seconds)
+            query = query.where(
+                (db.SimulationJob.status == "running")
+                | (db.SimulationJob.created_at < now - lease)
+            )
+
+        for candidate in (await session.scalars(query)).all():
+            claimed = await session.execute(
+                update(db.SimulationJob)
+                .where(db.SimulationJob.id == candidate, _is_claimable(now))
+                .values(
+                    status="running",
+                    lease_owner=owner,
+                    lease_expires_at=_lease_expiry(now),
+                    attempts=db.SimulationJob.attempts + 1,
+                )
+            )
+            if cast(CursorResult[Any], claimed).rowcount == 1:
+                return await session.get_one(db.SimulationJob, candidate)
+    return None
+
+
+async def renew_lease(sessionmaker: SessionMaker, job_id: UUID, owner: str) -> bool:
+    """Extend the lease of a running job. Returns False if the lease was lost."""
+    async with db.begin_session(sessionmaker) as session:
+        renewed = await session.execute(
+            update(db.SimulationJob)
+            .where(
+                db.SimulationJob.id == job_id,
+                db.SimulationJob.lease_owner == owner,
+                db.SimulationJob.status == "running",
+            )
+            .values(lease_expires_at=_lease_expiry(datetime.now()))
+        )
+        return cast(CursorResult[Any], renewed).rowcount == 1
+
+
+async def finish_job(
+    sessionmaker: SessionMaker, job_id: UUID, owner: str, status: JobStatus
+) -> None:
+    """Release the lease and record the final (or re-queued) status"""
+    async with db.begin_session(sessionmaker) as session:
+        await session.execute(
+            update(db.SimulationJob)
+            .where(
+                db.SimulationJob.id == job_id,
+                db.SimulationJob.lease_owner == owner,
+            )
+            .values(status=status, lease_owner=None, lease_expires_at=None)
+        )
@@ -0,0 +1,93 @@
+"""The model catalogue served by ``GET /models``.
+
+Everything about a model except whether the current user may use it is static,
+so it is serialized once per process. Access checks are cached per user for a
+short while (``ACIDWATCH_MODEL_ACCESS_TTL_SECONDS``), because they require an
+on-behalf-of token exchange with Entra ID.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable
+
+from acidwatch_api.models.base import get_parameters_schema
+from acidwatch_api.models.datamodel import ModelInfo
+
+if TYPE_CHECKING:
+    from acidwatch_api.models.base import BaseAdapter
+
+
+@dataclass(frozen=True)
+class ModelCatalogue:
+    adapters: tuple[type[BaseAdapter], ...]
+    # JSON-compatible 'ModelInfo' of each adapter, without 'accessError'
+    entries: tuple[dict[str, Any], ...]
+    digest: str
+
+    def render(
+        self, access_errors: Iterable[str | None]
+    ) -> tuple[list[dict[str, Any]], str]:
+        """Combine the catalogue with the user's access errors
+
+        Returns:
+            The response content and its ETag.
+
+        """
+        errors = list(access_errors)
+        etag = hashlib.sha256(json.dumps([self.digest, errors]).encode())
+        content = [
+            {**entry, "accessError": error}
+            for entry, error in zip(self.entries, errors)
+        ]
+        return content, f'"{etag.hexdigest()[:32]}"'
+
+
+@lru_cache(maxsize=8)
+def build_catalogue(adapters: tuple[type[BaseAdapter], ...]) -> ModelCatalogue:
+    entries = tuple(
+        ModelInfo(
+            access_error=None,
+            model_id=adapter.model_id,
+            display_name=adapter.display_name,
+            category=adapter.category,
+            description=adapter.description,
+            description_html=adapter.description_as_html(),
+            valid_substances=adapter.valid_substances,
+            parameters=get_parameters_schema(adapter),
+        ).model_dump(mode="json", by_alias=True, exclude={"access_error"})
+        for adapter in adapters
+    )
+    digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()
+    return ModelCatalogue(adapters=adapters, entries=entries, digest=digest)
+
+
+class AccessCache:
+    """Short-lived cache of access check results, keyed by user and scope"""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: dict[tuple[str, str], tuple[float, str | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(scope: str, jwt_token: str) -> tuple[str, str]:
+        return hashlib.sha256(jwt_token.encode()).hexdigest(), scope
+
+    def get(self, scope: str, jwt_token: str) -> tuple[bool, str | None]:
+        """Get whether the result is cached, and the cached access error"""
+        entry = self._entries.get(self._key(scope, jwt_token))
+        if entry is None or entry[0] <= time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def put(self, scope: str, jwt_token: str, error: str | None) -> None:
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+        self._entries[self._key(scope, jwt_token)] = (now + self.ttl, error)
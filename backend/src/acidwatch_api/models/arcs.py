@@ -52,6 +52,7 @@ class ArcsAdapter(BaseAdapter):
     ]
 
     base_url = SETTINGS.arcs_api_base_uri
+    max_concurrency = 4
 
     async def run(self) -> RunResult:
         response = await self.client.post(
@@ -54,6 +54,7 @@ class ArcsExpAdapter(BaseAdapter):
     ]
 
     base_url = SETTINGS.arcs_exp_api_base_uri
+    max_concurrency = 2
 
     async def run(self) -> RunResult:
         response = await self.client.post(
@@ -20,7 +20,6 @@ from typing import (
     no_type_check,
 )
 
-import httpx
 from fastapi import HTTPException
 from pydantic import (
     BaseModel,
@@ -34,7 +33,8 @@ from pydantic.alias_generators import to_camel
 from pydantic.config import JsonDict
 from typing_extensions import Doc
 
-from acidwatch_api.authentication import acquire_token_for_downstream_api
+from acidwatch_api.authentication import OnBehalfOfAuth
+from acidwatch_api.http_clients import HTTP_CLIENTS, ModelClient
 from acidwatch_api.models.datamodel import AnyPanel, Conditions, Phase
 
 
@@ -282,6 +282,49 @@ class BaseAdapter:
 
     base_url: Annotated[str | None, Doc("BaseURL for accessing a remote model")] = None
 
+    cpu_bound: Annotated[
+        bool,
+        Doc(
+            "The model computes locally instead of calling a remote service. "
+            "Such models are run in a worker process when the process pool "
+            "is enabled. The adapter instance must be picklable"
+        ),
+    ] = False
+
+    timeout: Annotated[
+        float | None,
+        Doc(
+            "Maximum number of seconds a run may take. CPU-bound models running "
+            "in the process pool are terminated when it is exceeded"
+        ),
+    ] = None
+
+    max_concurrency: Annotated[
+        int | None,
+        Doc(
+            "Maximum number of simultaneous runs of this model in a process. "
+            "Unlimited if not set"
+        ),
+    ] = None
+
+    max_queue: Annotated[
+        int | None,
+        Doc(
+            "Maximum number of runs that may wait for a free slot when "
+            "max_concurrency is reached. Further runs fail immediately. "
+            "Unlimited if not set"
+        ),
+    ] = None
+
+    version: Annotated[
+        str,
+        Doc(
+            "Version of the model's results. Results are cached by their "
+            "inputs, so bump this whenever the model starts returning "
+            "different results for the same inputs"
+        ),
+    ] = "1"
+
     @classmethod
     @lru_cache()
     def description_as_html(cls) -> str:
@@ -291,9 +334,12 @@ class BaseAdapter:
         return nh3.clean(html)
 
     @property
-    def client(self) -> httpx.AsyncClient:
+    def client(self) -> ModelClient:
         """A ready-to-use client to communicate with an external model
 
+        The underlying connection pool is shared by all runs of models with
+        the same base URL.
+
         Attributes:
             base_url: The external base URL. **MUST** be set to use this property.
             authentication: If set, acquire an MSAL token for the current user using this scope
@@ -305,14 +351,13 @@ class BaseAdapter:
         if self.base_url is None:
             raise ValueError(f"{type(self)} must specify 'base_url' field")
 
-        headers: dict[str, str] = {}
+        auth: OnBehalfOfAuth | None = None
         if self.scope is not None:
             if self.jwt_token is None:
                 raise HTTPException(401, "Must be authenticated")
-            token = acquire_token_for_downstream_api(self.scope, self.jwt_token)
-            headers["Authorization"] = f"Bearer {token}"
+            auth = OnBehalfOfAuth(self.scope, self.jwt_token)
 
-        return httpx.AsyncClient(base_url=self.base_url, headers=headers)
+        return ModelClient(HTTP_CLIENTS.get(self.base_url), auth)
 
     @property
     def concentrations(self) -> dict[str, float | int]:
@@ -370,3 +415,27 @@ class BaseAdapter:
             parameters: If defined, contains pydantic-validated model parameter instance
         """
         raise NotImplementedError()
+
+    async def run_batch(
+        self, concentrations: list[dict[str, float | int]]
+    ) -> list[RunResult | Exception]:
+        """Run the simulation for several compositions
+
+        Parameters and conditions are shared by all runs. Models that can
+        vectorize or amortize their setup over many compositions (eg. a grid
+        simulation) should override this. By default, ``run`` is called once
+        per composition.
+
+        Returns:
+            One result per composition, in order. Failed runs are returned as
+            the exception they raised.
+
+        """
+        results: list[RunResult | Exception] = []
+        for value in concentrations:
+            self.set_concentrations(value)
+            try:
+                results.append(await self.run())
+            except Exception as exc:
+                results.append(exc)
+        return results
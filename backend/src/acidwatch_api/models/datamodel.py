@@ -49,7 +49,7 @@ class Simulation(_BaseModel):
 
 class ModelResult(_BaseModel):
     phases: list[Phase]
-    panels: list[AnyPanel]
+    panels: list[AnyPanel | PanelDescriptor]
 
 
 class SimulationResult(_BaseModel):
@@ -59,6 +59,22 @@ class SimulationResult(_BaseModel):
     error: str | None = None
 
 
+class SimulationStatus(_BaseModel):
+    status: Literal["done", "pending", "error"]
+    completed_steps: int
+    total_steps: int
+
+
+class StepResult(_BaseModel):
+    """A finished step of a simulation's model chain, as sent by event streams"""
+
+    step: int
+    # Position of the simulation in its grid simulation, if any
+    position: int | None = None
+    result: ModelResult | None = None
+    error: str | None = None
+
+
 class AxisRange(_BaseModel):
     """A linear, inclusive range from min to max with a given step size."""
 
@@ -125,6 +141,60 @@ class GridSimulationResult(_BaseModel):
     status: Literal["done", "pending"]
     axes: list[Axis]
     simulations: list[SimulationResult]
+    # Pass as '?since=' to get only the points that finish later
+    cursor: int
+
+
+class GridSimulationStatus(_BaseModel):
+    status: Literal["done", "pending"]
+    completed_steps: int
+    total_steps: int
+
+
+class PhaseColumns(_BaseModel):
+    kind: str
+    # One value per grid point, None where the point has no such phase or
+    # substance, or no result yet
+    fraction: list[float | None]
+    concentrations: dict[str, list[float | None]]
+
+
+class StepColumns(_BaseModel):
+    model_id: str
+    phases: list[PhaseColumns]
+
+
+class ColumnarGridSimulationResult(_BaseModel):
+    """A grid simulation's results as arrays aligned with its points
+
+    Points are in the order of the cartesian product of the axes, like the
+    simulations of ``GridSimulationResult``.
+    """
+
+    status: Literal["done", "pending"]
+    axes: list[Axis]
+    # The values of each axis, one per point
+    coordinates: list[list[float]]
+    # Input of every point, apart from the axes' substances
+    concentrations: dict[str, int | float]
+    conditions: Conditions
+    models: list[ModelInput]
+    statuses: list[Literal["done", "pending", "error"]]
+    errors: list[str | None]
+    steps: list[StepColumns]
+    cursor: int
+
+
+class GridPointResult(_BaseModel):
+    position: int
+    simulation: SimulationResult
+
+
+class GridSimulationUpdate(GridSimulationStatus):
+    """The points of a grid simulation that finished after a cursor"""
+
+    cursor: int
+    points: list[GridPointResult]
 
 
 class JsonResult(BaseModel):
@@ -155,6 +225,18 @@ class TableResult(BaseModel):
 AnyPanel: TypeAlias = JsonResult | TextResult | ReactionPathsResult | TableResult
 
 
+class PanelDescriptor(BaseModel):
+    """A panel without its content
+
+    The content is served by ``GET /simulations/{id}/steps/{n}/panels/{k}``.
+    """
+
+    type: Literal["json", "reaction_paths", "text", "table"]
+    label: str | None = None
+    # Of the panel's JSON, in bytes
+    size: int
+
+
 class ModelInfo(BaseModel):
     model_config = ConfigDict(
         alias_generator=to_camel,
@@ -1,6 +1,11 @@
 import asyncio
+import logging
+from functools import lru_cache
+from typing import Any
 
+from jpype import JArray, JDouble
 from neqsim import jneqsim
+from opentelemetry import metrics
 from enum import StrEnum
 from acidwatch_api.models.base import (
     BaseAdapter,
@@ -10,13 +15,28 @@ from acidwatch_api.models.base import (
 )
 from acidwatch_api.models.datamodel import Phase
 
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+
+SOLVER_ITERATIONS = meter.create_histogram(
+    "acidwatch.gibbs.iterations",
+    description="Iterations used by the Gibbs reactor to reach equilibrium",
+)
+
 # Model constants
-# Damping factor for composition convergence in Gibbs reactor
+# Damping factor for composition convergence in Gibbs reactor. With neqsim's
+# GibbsReactor, the number of iterations depends on this factor, not on how
+# close the inlet composition is to equilibrium: seeding a point with the
+# solution of a neighbouring grid point does not reduce it.
 DAMPING_COMPOSITION = 0.05  # Used for reactor.setDampingComposition()
 MAX_ITERATIONS = 5000  # Used for reactor.setMaxIterations()
 CONVERGENCE_TOLERANCE = 1e-2  # Used for reactor.setConvergenceTolerance()
-# Timeout for the (blocking) reactor.run() call.
+# Timeout for a whole run, most of which is spent in reactor.run()
 REACTOR_TIMEOUT_SECONDS = 60
+# Number of initialized systems (per equation of state and component set) to
+# keep for cloning
+SYSTEM_TEMPLATE_CACHE_SIZE = 16
 
 
 NOT_INITIALIZED_BY_DEFAULT = [
@@ -118,6 +138,40 @@ class GibbsMinimizationModelParameters(BaseParameters):
     )
 
 
+def _create_system(eos: _EquationOfState, temperature: float, pressure: float) -> Any:
+    if eos == _EquationOfState.SRK:
+        return jneqsim.thermo.system.SystemSrkEos(temperature, pressure)
+    elif eos == _EquationOfState.PR:
+        return jneqsim.thermo.system.SystemPrEos(temperature, pressure)
+    elif eos == _EquationOfState.SRKCPA:
+        return jneqsim.thermo.system.SystemSrkCPAstatoil(temperature, pressure)
+    elif eos == _EquationOfState.IdealGas:
+        return jneqsim.thermo.system.SystemIdealGas(temperature, pressure)
+    raise NotImplementedError(f"Equation of state not implemented: {eos}")
+
+
+@lru_cache(maxsize=SYSTEM_TEMPLATE_CACHE_SIZE)
+def _system_template(eos: _EquationOfState, components: tuple[str, ...]) -> Any:
+    """Initialized system to clone for each run
+
+    Adding the components and setting up the mixing rule is a large part of
+    each run, while cloning the result takes well under a millisecond. Runs
+    only differ in their compositions, temperature and pressure, which are
+    set on the clone.
+    """
+    system = _create_system(eos, 298.15, 1.01325)
+    for component in components:
+        system.addComponent(component, 1.0, "mole/sec")
+
+    if eos in (_EquationOfState.SRK, _EquationOfState.PR):
+        system.setMixingRule(2)
+    elif eos == _EquationOfState.SRKCPA:
+        system.setMixingRule(10)
+
+    system.setMultiPhaseCheck(True)
+    return system
+
+
 class GibbsMinimizationModelAdapter(BaseAdapter):
     valid_substances = INITIALIZED_BY_DEFAULT + NOT_INITIALIZED_BY_DEFAULT
 
@@ -158,6 +212,9 @@ class GibbsMinimizationModelAdapter(BaseAdapter):
     parameters: GibbsMinimizationModelParameters
     description = DESCRIPTION
     category = "ChemicalEquilibrium"
+    max_concurrency = 2
+    cpu_bound = True
+    timeout = REACTOR_TIMEOUT_SECONDS
 
     async def run(self) -> RunResult:
         eos = self.parameters.equation_of_state
@@ -165,32 +222,18 @@ class GibbsMinimizationModelAdapter(BaseAdapter):
         temperature = self.conditions.temperature + 273
         pressure = self.conditions.pressure
 
-        if eos == _EquationOfState.SRK:
-            system = jneqsim.thermo.system.SystemSrkEos(temperature, pressure)
-        elif eos == _EquationOfState.PR:
-            system = jneqsim.thermo.system.SystemPrEos(temperature, pressure)
-        elif eos == _EquationOfState.SRKCPA:
-            system = jneqsim.thermo.system.SystemSrkCPAstatoil(temperature, pressure)
-        elif eos == _EquationOfState.IdealGas:
-            system = jneqsim.thermo.system.SystemIdealGas(temperature, pressure)
-        else:
-            raise NotImplementedError(f"Equation of state not implemented: {eos}")
-
-        co2_content = 1e6 - sum(self.concentrations.values())
-
-        # Adding components to the system
-        system.addComponent("CO2", co2_content, "mole/sec")
+        # Moles per neqsim component, in the order they are added to the
+        # system. Some formulas map to the same neqsim component.
+        moles: dict[str, float] = {"CO2": 1e6 - sum(self.concentrations.values())}
         for component, amount in self.concentrations.items():
             neqsim_name = self.formula_to_neqsim.get(component, component)
             if amount > 0.0 or component in INITIALIZED_BY_DEFAULT:
-                system.addComponent(neqsim_name, amount, "mole/sec")
-
-        if eos in (_EquationOfState.SRK, _EquationOfState.PR):
-            system.setMixingRule(2)
-        elif eos == _EquationOfState.SRKCPA:
-            system.setMixingRule(10)
+                moles[neqsim_name] = moles.get(neqsim_name, 0.0) + amount
 
-        system.setMultiPhaseCheck(True)
+        system = _system_template(eos, tuple(moles)).clone()
+        system.setTemperature(temperature)
+        system.setPressure(pressure)
+        system.setMolarFlowRates(JArray(JDouble)(list(moles.values())))
 
         # # Create an inlet stream
         inlet_stream = jneqsim.process.equipment.stream.Stream("Inlet Stream", system)
@@ -210,17 +253,13 @@ class GibbsMinimizationModelAdapter(BaseAdapter):
             jneqsim.process.equipment.reactor.GibbsReactor.EnergyMode.ISOTHERMAL
         )
 
-        try:
-            await asyncio.wait_for(
-                asyncio.to_thread(reactor.run),
-                timeout=REACTOR_TIMEOUT_SECONDS,
-            )
-        except asyncio.TimeoutError:
-            raise RuntimeError(
-                f"Gibbs reactor did not converge within "
-                f"{REACTOR_TIMEOUT_SECONDS}s using the '{eos.value}' "
-                f"equation of state."
-            )
+        # The timeout is enforced by the caller, which terminates the worker
+        # process running this adapter when the process pool is enabled.
+        await asyncio.to_thread(reactor.run)
+
+        iterations = int(reactor.getActualIterations())
+        SOLVER_ITERATIONS.record(iterations, {"equation_of_state": str(eos)})
+        logger.debug("Gibbs reactor finished after %d iterations", iterations)
 
         assert inlet_stream.getFluid().getNumberOfPhases() == 1, (
             "Gibbs model cannot work with two phases as of now"
@@ -37,6 +37,7 @@ class PhpitzReactiveAdapter(BaseAdapter):
 
     category = "ChemicalEquilibrium"
     base_url = SETTINGS.phpitz_api_base_uri
+    max_concurrency = 4
 
     async def run(self) -> RunResult:
         res = await self.client.post(
@@ -39,6 +39,7 @@ class PhpitzSolubilityAdapter(BaseAdapter):
 
     category = "PhaseEquilibrium"
     base_url = SETTINGS.phpitz_api_base_uri
+    max_concurrency = 4
 
     async def run(self) -> RunResult:
         res = await self.client.post(
@@ -42,6 +42,7 @@ class SolubilityCCSAdapter(BaseAdapter):
     valid_substances = ["H2O", "H2SO4", "HNO3"]
     parameters: SolubilityCCSParameters
     category = "PhaseEquilibrium"
+    cpu_bound = True
 
     async def run(self) -> RunResult:
         # Get concentrations (mole fractions)
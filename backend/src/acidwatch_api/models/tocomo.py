@@ -48,6 +48,7 @@ class TocomoAdapter(BaseAdapter):
 
     authentication = False
     base_url = SETTINGS.tocomo_api_base_uri
+    max_concurrency = 8
 
     async def run(self) -> RunResult:
         res = await self.client.post(
@@ -0,0 +1,77 @@
+"""Notifications of simulation progress.
+
+Whenever step results are saved, the IDs of the affected simulations are
+published on the bus. The event streams (``GET /simulations/{id}/events`` and
+``GET /grid-simulations/{id}/events``) subscribe to them, so that they only
+read the database when something has changed.
+
+The bus is per process. Jobs that run in a separate ``acidwatch-api-worker``
+are not published to the API, which is why subscribers also look for changes
+every ``ACIDWATCH_EVENTS_POLL_SECONDS``. A bus that is shared between
+processes (eg. PostgreSQL's LISTEN/NOTIFY) can replace it without changing
+the subscribers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+from uuid import UUID
+
+
+class Subscription:
+    def __init__(self) -> None:
+        self._changed: set[UUID] = set()
+        self._event = asyncio.Event()
+
+    def _notify(self, simulation_id: UUID) -> None:
+        self._changed.add(simulation_id)
+        self._event.set()
+
+    async def wait(self, timeout: float) -> set[UUID]:
+        """Wait for notifications for at most ``timeout`` seconds
+
+        Returns:
+            The simulations that changed since the last call, or an empty set
+            if the wait timed out.
+
+        """
+        if not self._changed:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except TimeoutError:
+                pass
+        self._event.clear()
+        changed, self._changed = self._changed, set()
+        return changed
+
+
+class NotificationBus:
+    def __init__(self) -> None:
+        self._subscriptions: defaultdict[UUID, set[Subscription]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    async def publish(self, simulation_ids: Iterable[UUID]) -> None:
+        for simulation_id in simulation_ids:
+            for subscription in self._subscriptions.get(simulation_id, ()):
+                subscription._notify(simulation_id)
+
+    @contextmanager
+    def subscribe(self, simulation_ids: Iterable[UUID]) -> Iterator[Subscription]:
+        """Subscribe to changes of the given simulations"""
+        subscription = Subscription()
+        simulation_ids = list(simulation_ids)
+        for simulation_id in simulation_ids:
+            self._subscriptions[simulation_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            for simulation_id in simulation_ids:
+                subscribers = self._subscriptions[simulation_id]
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[simulation_id]
@@ -0,0 +1,170 @@
+"""Warm worker processes for CPU-bound adapters.
+
+Adapters marked with ``BaseAdapter.cpu_bound`` do their computation in the
+Python interpreter or the JVM, where it competes with request handling for
+the GIL and the event loop. When the pool is enabled
+(``ACIDWATCH_PROCESS_POOL_SIZE``), such adapters are pickled and run in one of
+a fixed set of long-lived processes instead. The processes import the model
+packages once at startup, so neqsim's JVM and solubilityccs stay loaded
+between runs.
+
+Processes are started with the ``spawn`` method: forking a process that has
+already started a JVM is not safe.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import pickle
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Iterable
+
+if TYPE_CHECKING:
+    from acidwatch_api.models.base import BaseAdapter, RunResult
+
+# Compositions to run with ``BaseAdapter.run_batch``, or None for ``run``
+type Batch = list[dict[str, float | int]] | None
+
+logger = logging.getLogger(__name__)
+
+_context = multiprocessing.get_context("spawn")
+
+
+def _picklable(exc: Exception) -> Exception:
+    try:
+        pickle.dumps(exc)
+        return exc
+    except Exception:
+        # Not every exception can be pickled (eg. Java exceptions)
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+
+
+async def _call(adapter: BaseAdapter, batch: Batch) -> Any:
+    if batch is None:
+        return await adapter.run()
+    results = await adapter.run_batch(batch)
+    return [_picklable(r) if isinstance(r, Exception) else r for r in results]
+
+
+def _serve(conn: Connection, preload: tuple[str, ...]) -> None:
+    for module in preload:
+        importlib.import_module(module)
+
+    while (message := conn.recv()) is not None:
+        adapter, batch = message
+        try:
+            conn.send((True, asyncio.run(_call(adapter, batch))))
+        except Exception as exc:
+            logger.exception("Adapter %s failed in worker process", adapter.model_id)
+            conn.send((False, _picklable(exc)))
+
+
+class _Worker:
+    def __init__(self, preload: tuple[str, ...]) -> None:
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(
+            target=_serve, args=(child_conn, preload), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def call(self, adapter: BaseAdapter, batch: Batch) -> tuple[bool, Any]:
+        self.conn.send((adapter, batch))
+        return self.conn.recv()  # type: ignore[no-any-return]
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessPool:
+    def __init__(self, size: int, preload: Iterable[str] = ()) -> None:
+        self.size = size
+        self._preload = tuple(preload)
+        self._workers: list[_Worker] = []
+        # Idle workers, and None for each discarded one, so that a caller
+        # waiting for a worker spawns its replacement
+        self._idle: asyncio.Queue[_Worker | None] = asyncio.Queue()
+
+    def start(self) -> None:
+        """Start all worker processes up front, so that they are warm"""
+        while len(self._workers) < self.size:
+            self._idle.put_nowait(self._spawn())
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers.clear()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._preload)
+        self._workers.append(worker)
+        return worker
+
+    def _discard(self, worker: _Worker) -> None:
+        worker.kill()
+        self._workers.remove(worker)
+        self._idle.put_nowait(None)
+
+    async def _acquire(self) -> _Worker:
+        if self._idle.empty() and len(self._workers) < self.size:
+            return self._spawn()
+        if (worker := await self._idle.get()) is None:
+            return self._spawn()
+        return worker
+
+    async def run(
+        self, adapter: BaseAdapter, timeout: float | None = None
+    ) -> RunResult:
+        """Run ``adapter.run()`` in a worker process
+
+        Raises:
+            TimeoutError: If the run takes longer than ``timeout`` seconds.
+                The worker process is killed, so the computation does not
+                keep running in the background.
+
+        """
+        return await self._call(adapter, None, timeout)  # type: ignore[no-any-return]
+
+    async def run_batch(
+        self,
+        adapter: BaseAdapter,
+        concentrations: list[dict[str, float | int]],
+        timeout: float | None = None,
+    ) -> list[RunResult | Exception]:
+        """Run ``adapter.run_batch()`` in a worker process, see ``run``"""
+        return await self._call(  # type: ignore[no-any-return]
+            adapter, concentrations, timeout
+        )
+
+    async def _call(
+        self, adapter: BaseAdapter, batch: Batch, timeout: float | None
+    ) -> Any:
+        worker = await self._acquire()
+        try:
+            ok, value = await asyncio.wait_for(
+                asyncio.to_thread(worker.call, adapter, batch), timeout
+            )
+        except BaseException:
+            # Timed out, cancelled or the process died. Either way the worker
+            # is in an unknown state, so kill it and spawn a new one in its place.
+            self._discard(worker)
+            raise
+
+        self._idle.put_nowait(worker)
+        if not ok:
+            raise value
+        return value
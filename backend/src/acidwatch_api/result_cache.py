@@ -0,0 +1,166 @@
+"""Content-addressed cache of adapter results.
+
+Adapter runs are deterministic in their inputs: the model, its version, the
+parameters, the conditions and the concentrations the model sees. The cache
+key is a hash of exactly those, so identical runs, whether from different
+users or different grid points, only reach the model once.
+
+Entries are stored in the database so that they are shared between processes
+and survive restarts. Each process additionally keeps the most recently used
+entries in memory, bounded by a byte budget and a TTL, so that hot inputs
+(eg. the frontend's examples) are served without a database round trip.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from opentelemetry import metrics
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+import acidwatch_api.database as db
+
+if TYPE_CHECKING:
+    from acidwatch_api.database import SessionMaker
+    from acidwatch_api.models.base import BaseAdapter
+
+
+meter = metrics.get_meter(__name__)
+
+MEMORY_HITS = meter.create_counter(
+    "acidwatch.result_cache.memory.hits",
+    description="Result cache lookups served from process memory",
+)
+MEMORY_MISSES = meter.create_counter(
+    "acidwatch.result_cache.memory.misses",
+    description="Result cache lookups that had to go to the database",
+)
+MEMORY_EVICTIONS = meter.create_counter(
+    "acidwatch.result_cache.memory.evictions",
+    description="Entries dropped from process memory to stay within the byte budget",
+)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    phases: list[dict[str, Any]]
+    panels: list[Any]
+
+
+def cache_key(adapter: BaseAdapter) -> str:
+    parameters = getattr(adapter, "parameters", None)
+    payload = {
+        "model_id": adapter.model_id,
+        "version": adapter.version,
+        "parameters": (
+            parameters.model_dump(mode="json")
+            if isinstance(parameters, BaseModel)
+            else {}
+        ),
+        "conditions": adapter.conditions.model_dump(mode="json"),
+        # 1 and 1.0 must hash the same
+        "concentrations": {
+            key: float(value) for key, value in adapter.concentrations.items()
+        },
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _entry_size(entry: CacheEntry) -> int:
+    """Approximate memory footprint, as the size of the JSON encoding"""
+    return len(json.dumps([entry.phases, entry.panels]))
+
+
+class MemoryCache:
+    """Least-recently-used entries, bounded by total size and age"""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # key -> (entry, size, expires_at), least recently used first
+        self._entries: OrderedDict[str, tuple[CacheEntry, int, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> CacheEntry | None:
+        item = self._entries.get(key)
+        if item is None:
+            MEMORY_MISSES.add(1)
+            return None
+
+        entry, size, expires_at = item
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            MEMORY_MISSES.add(1)
+            return None
+
+        self._entries.move_to_end(key)
+        MEMORY_HITS.add(1)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (entry, size, time.monotonic() + self.ttl)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            MEMORY_EVICTIONS.add(1)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+class ResultCache:
+    def __init__(self, sessionmaker: SessionMaker, memory: MemoryCache) -> None:
+        self._sessionmaker = sessionmaker
+        self.memory = memory
+
+    async def get(self, key: str) -> CacheEntry | None:
+        if (entry := self.memory.get(key)) is not None:
+            return entry
+
+        async with db.begin_session(self._sessionmaker) as session:
+            row = (
+                await session.scalars(
+                    select(db.CachedResult).where(db.CachedResult.key == key)
+                )
+            ).one_or_none()
+            if row is None:
+                return None
+            entry = CacheEntry(phases=row.phases, panels=row.panels)
+
+        self.memory.put(key, entry)
+        return entry
+
+    async def put(self, key: str, model_id: str, entry: CacheEntry) -> None:
+        self.memory.put(key, entry)
+        try:
+            async with db.begin_session(self._sessionmaker) as session:
+                session.add(
+                    db.CachedResult(
+                        key=key,
+                        model_id=model_id,
+                        phases=entry.phases,
+                        panels=entry.panels,
+                    )
+                )
+        except IntegrityError:
+            # An identical run finished first
+            pass
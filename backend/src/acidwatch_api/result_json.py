@@ -0,0 +1,103 @@
+"""Fast JSON encoding of simulation results.
+
+Phases and panels are validated when a model run finishes, before they are
+stored. Results are therefore assembled from the stored JSON as it is, and
+encoded with orjson, instead of being validated into pydantic models and then
+encoded again. The content is the same as that of the corresponding pydantic
+models (eg. ``SimulationResult``) dumped by alias.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+import orjson
+
+import acidwatch_api.database as db
+from acidwatch_api.models.datamodel import Conditions
+
+logger = logging.getLogger(__name__)
+
+type Chain = list[tuple[db.ModelInput, db.ModelResult | None]]
+
+
+def dumps(content: Any) -> bytes:
+    """Encode JSON-compatible content, as from ``model_dump(mode="json")``"""
+    return orjson.dumps(content)
+
+
+def encoded(content: bytes | str) -> orjson.Fragment:
+    """Include already encoded JSON, eg. a result snapshot, in content to
+    ``dumps`` as it is"""
+    return orjson.Fragment(content)
+
+
+def loads(content: bytes | str) -> Any:
+    return orjson.loads(content)
+
+
+def _input_concentrations(phases: list[dict[str, Any]]) -> dict[str, Any]:
+    merged: dict[str, Any] = {}
+    for phase in phases:
+        if phase["kind"] == "co2-rich":
+            merged.update(phase["concentrations"])
+    return merged
+
+
+def simulation_result_content(
+    simulation: db.Simulation, chain: Chain
+) -> dict[str, Any]:
+    """The content of a simulation's ``SimulationResult``
+
+    ``chain`` must be ordered, see ``order_chain``.
+    """
+    models: list[dict[str, Any]] = []
+    results: list[dict[str, Any]] = []
+    status = "done"
+    error = None
+    for model_input, result in chain:
+        models.append(
+            {"modelId": model_input.model_id, "parameters": model_input.parameters}
+        )
+        if result is None:
+            status = "pending"
+        elif result.error is not None:
+            logger.error("Simulation %s failed: %s", simulation.id, result.error)
+            status, error = "error", result.error
+            break
+        else:
+            results.append({"phases": result.phases, "panels": result.panels})
+
+    return {
+        "status": status,
+        "input": {
+            "concentrations": _input_concentrations(simulation.phases),
+            "conditions": Conditions(**(simulation.conditions or {})).model_dump(
+                mode="json", by_alias=True
+            ),
+            "models": models,
+        },
+        "results": results,
+        "error": error,
+    }
+
+
+def describe(panels: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """The ``PanelDescriptor`` of each panel"""
+    return [
+        {"type": panel["type"], "label": panel.get("label"), "size": len(dumps(panel))}
+        for panel in panels
+    ]
+
+
+def describe_panels(content: dict[str, Any]) -> dict[str, Any]:
+    """Replace the panels of a ``SimulationResult``'s content with
+    ``PanelDescriptor``s"""
+    return {
+        **content,
+        "results": [
+            {**result, "panels": describe(result["panels"])}
+            for result in content["results"]
+        ],
+    }
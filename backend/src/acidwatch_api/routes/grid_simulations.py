@@ -2,35 +2,60 @@ from __future__ import annotations
 
 import itertools
 import logging
-from typing import Annotated, Literal
-from uuid import UUID
+from typing import Annotated, Any, AsyncIterator, Literal
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
+from fastapi.sse import EventSourceResponse, ServerSentEvent
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import acidwatch_api.database as db
+from acidwatch_api import jobs
 from acidwatch_api.authentication import OptionalCurrentUser
+from acidwatch_api.columnar import build_columnar_result
+from acidwatch_api.result_json import describe_panels, dumps, encoded, loads
 from acidwatch_api.database import GetDB
+from acidwatch_api.state import GetState
 from acidwatch_api.models import InputError
 from acidwatch_api.models.datamodel import (
     Axis,
+    ColumnarGridSimulationResult,
     CreateGridSimulation,
     GridSimulationResult,
-    SimulationResult,
+    GridSimulationStatus,
+    GridSimulationUpdate,
 )
-from acidwatch_api.models.base import BaseAdapter
 from acidwatch_api.routes.models import (
     AdapterSet,
     build_adapters,
-    build_model_input_rows,
-    build_simulation_result,
+    build_model_input_values,
+    build_simulation_results,
+    finished_steps,
     get_adapters,
-    run_adapters,
+    order_chain,
+    query_chain_rows_by_simulation,
+    run_grid_jobs,
+    store_snapshots,
+    to_event,
 )
+from acidwatch_api.settings import SETTINGS
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+# Media type of 'ColumnarGridSimulationResult', which can be requested with
+# the Accept header instead of '?format=columnar'
+COLUMNAR_MEDIA_TYPE = "application/vnd.acidwatch.columnar+json"
+
 
 def _cartesian_values(axes: list[Axis]) -> list[list[float]]:
     ranges = [axis.range.values() for axis in axes]
@@ -41,7 +66,7 @@ def _cartesian_values(axes: list[Axis]) -> list[list[float]]:
 async def run_grid_simulation(
     create: CreateGridSimulation,
     user: OptionalCurrentUser,
-    request: Request,
+    state: GetState,
     session: GetDB,
     background_tasks: BackgroundTasks,
     all_adapters: Annotated[AdapterSet, Depends(get_adapters)],
@@ -71,83 +96,352 @@ async def run_grid_simulation(
         raise HTTPException(status_code=422, detail=exc.detail)
 
     grid_points = _cartesian_values(create.axes)
+    owner_id = UUID(user.id) if user else None
+    conditions = create.conditions.model_dump()
 
-    scheduled: list[tuple[dict[str, int | float], list[BaseAdapter], list[UUID]]] = []
-    simulation_ids: list[str] = []
-
-    for coordinates in grid_points:
+    # IDs are generated up front, so that all points are inserted with one
+    # statement per table instead of one flush per point
+    grid_id = uuid4()
+    simulation_rows: list[dict[str, Any]] = []
+    model_input_rows: list[dict[str, Any]] = []
+    job_rows: list[dict[str, Any]] = []
+    point_rows: list[dict[str, Any]] = []
+    for position, coordinates in enumerate(grid_points):
         point_concentrations = {
             **create.concentrations,
             **{axis.substance: value for axis, value in zip(create.axes, coordinates)},
         }
-        model_input_rows = build_model_input_rows(create.models)
-        simulation = db.Simulation(
-            owner_id=UUID(user.id) if user else None,
-            phases=[
-                {
-                    "kind": "co2-rich",
-                    "fraction": 1.0,
-                    "concentrations": point_concentrations,
-                }
-            ],
-            conditions=create.conditions.model_dump(),
-            model_inputs=model_input_rows,
+        simulation_id = uuid4()
+        simulation_rows.append(
+            {
+                "id": simulation_id,
+                "owner_id": owner_id,
+                "phases": [
+                    {
+                        "kind": "co2-rich",
+                        "fraction": 1.0,
+                        "concentrations": point_concentrations,
+                    }
+                ],
+                "conditions": conditions,
+                "total_steps": len(create.models),
+            }
         )
-        session.add(simulation)
-        session.flush()
-        simulation_ids.append(str(simulation.id))
-
-        point_adapters = build_adapters(
-            create.models, create.conditions, all_adapters, jwt_token
-        )
-        scheduled.append(
-            (
-                point_concentrations,
-                point_adapters,
-                [row.id for row in model_input_rows],
-            )
+        model_input_rows.extend(build_model_input_values(create.models, simulation_id))
+        job_rows.append(jobs.new_job_values(simulation_id))
+        point_rows.append(
+            {
+                "grid_simulation_id": grid_id,
+                "simulation_id": simulation_id,
+                "position": position,
+                "coordinates": coordinates,
+            }
         )
 
-    grid = db.GridSimulation(
-        owner_id=UUID(user.id) if user else None,
-        axes=[axis.model_dump() for axis in create.axes],
-        simulation_ids=simulation_ids,
+    session.add(
+        db.GridSimulation(
+            id=grid_id,
+            owner_id=owner_id,
+            axes=[axis.model_dump() for axis in create.axes],
+        )
+    )
+    await session.flush()
+    await session.execute(insert(db.Simulation), simulation_rows)
+    # The first step of each chain has no previous step. Render its NULL, or
+    # the rows would be split into one batch per step.
+    await session.execute(
+        insert(db.ModelInput).execution_options(render_nulls=True), model_input_rows
     )
-    session.add(grid)
-    session.commit()
+    await session.execute(insert(db.SimulationJob), job_rows)
+    await session.execute(insert(db.GridSimulationPoint), point_rows)
+    await session.commit()
+    job_ids = [row["id"] for row in job_rows]
 
-    for point_concentrations, point_adapters, model_input_ids in scheduled:
+    if SETTINGS.acidwatch_inline_worker:
         background_tasks.add_task(
-            run_adapters,
-            request.state.session,
-            point_concentrations,
-            point_adapters,
-            model_input_ids,
+            run_grid_jobs,
+            state,
+            job_ids,
+            all_adapters,
+            SETTINGS.acidwatch_grid_concurrency,
+            jwt_token,
+        )
+
+    return grid_id
+
+
+async def _get_grid_update(
+    session: AsyncSession,
+    grid_id: UUID,
+    since: int,
+    panels: Literal["full", "descriptors"],
+) -> Response:
+    status = await _query_grid_status(session, grid_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Grid simulation not found")
+    # Read after the status, so that a "done" update has the final cursor, and
+    # before the points, so that points finishing in the meantime are returned
+    # again rather than skipped by the next update
+    cursor = await session.scalar(
+        select(db.GridSimulation.completed_points).where(
+            db.GridSimulation.id == grid_id
         )
+    )
+    assert cursor is not None
+    rows = (
+        await session.execute(
+            select(
+                db.GridSimulationPoint.position,
+                db.GridSimulationPoint.simulation_id,
+                db.Simulation.result_snapshot,
+            )
+            .join(db.Simulation)
+            .where(
+                db.GridSimulationPoint.grid_simulation_id == grid_id,
+                db.GridSimulationPoint.completion_index > since,
+                db.GridSimulationPoint.completion_index <= cursor,
+            )
+            .order_by(db.GridSimulationPoint.completion_index)
+        )
+    ).all()
+
+    snapshots = {row.simulation_id: row.result_snapshot for row in rows}
+    missing = [key for key, snapshot in snapshots.items() if snapshot is None]
+    if missing:
+        # Finished before snapshots were stored
+        for key, (snapshot, _) in (await store_snapshots(session, missing)).items():
+            snapshots[key] = snapshot
+
+    def simulation(snapshot: str) -> Any:
+        if panels == "descriptors":
+            return describe_panels(loads(snapshot))
+        return encoded(snapshot)
+
+    content = {
+        **status.model_dump(mode="json", by_alias=True),
+        "cursor": cursor,
+        "points": [
+            {
+                "position": row.position,
+                "simulation": simulation(snapshots[row.simulation_id]),
+            }
+            for row in rows
+        ],
+    }
+    return Response(dumps(content), media_type="application/json")
 
-    return grid.id
+
+async def _get_columnar_result(
+    session: AsyncSession, grid: db.GridSimulation, cursor: int
+) -> Response:
+    rows = (
+        await session.execute(
+            select(db.GridSimulationPoint.coordinates, db.Simulation)
+            .join(db.Simulation)
+            .where(db.GridSimulationPoint.grid_simulation_id == grid.id)
+            .order_by(db.GridSimulationPoint.position)
+        )
+    ).all()
+    simulations = [row.Simulation for row in rows]
+    chains = await query_chain_rows_by_simulation(
+        session, [simulation.id for simulation in simulations]
+    )
+    result = build_columnar_result(
+        [Axis(**a) for a in grid.axes],
+        cursor,
+        [row.coordinates for row in rows],
+        simulations,
+        [order_chain(chains[simulation.id]) for simulation in simulations],
+    )
+    return Response(
+        result.model_dump_json(by_alias=True), media_type=COLUMNAR_MEDIA_TYPE
+    )
 
 
-@router.get("/grid-simulations/{grid_id}/result")
-def get_grid_simulation_result(
+@router.get(
+    "/grid-simulations/{grid_id}/result",
+    response_model=GridSimulationResult
+    | GridSimulationUpdate
+    | ColumnarGridSimulationResult,
+)
+async def get_grid_simulation_result(
     grid_id: UUID,
+    request: Request,
     session: GetDB,
-) -> GridSimulationResult:
-    grid = session.get_one(db.GridSimulation, grid_id)
+    since: int | None = None,
+    format: Literal["nested", "columnar"] | None = None,
+    panels: Literal["full", "descriptors"] = "full",
+) -> Response:
+    """Get the results of all points of a grid simulation
+
+    With ``since``, a cursor from an earlier response, get a
+    ``GridSimulationUpdate`` with only the points that have finished since.
+
+    With ``format=columnar``, or ``Accept: application/vnd.acidwatch.columnar+json``,
+    get a ``ColumnarGridSimulationResult``, which has no panels.
+
+    With ``panels=descriptors``, the panels of each simulation are replaced with
+    ``PanelDescriptor``s, as in ``GET /simulations/{id}/result``.
+    """
+    if format is None:
+        accept = request.headers.get("Accept", "")
+        format = "columnar" if COLUMNAR_MEDIA_TYPE in accept else "nested"
+    if format == "columnar" and since is not None:
+        raise HTTPException(
+            status_code=422,
+            detail="'since' is not supported by the columnar format",
+        )
+
+    if since is not None:
+        return await _get_grid_update(session, grid_id, since, panels)
+
+    grid = await session.get(db.GridSimulation, grid_id)
+    if grid is None:
+        raise HTTPException(status_code=404, detail="Grid simulation not found")
+    # Read before the points, so that points finishing in the meantime are
+    # returned again rather than skipped by the next update
+    cursor = grid.completed_points
+    if format == "columnar":
+        return await _get_columnar_result(session, grid, cursor)
 
-    axes = [Axis(**a) for a in grid.axes]
-    sim_uuids = [UUID(sid) for sid in grid.simulation_ids]
+    sim_uuids = list(
+        await session.scalars(
+            select(db.GridSimulationPoint.simulation_id)
+            .where(db.GridSimulationPoint.grid_simulation_id == grid_id)
+            .order_by(db.GridSimulationPoint.position)
+        )
+    )
 
-    simulations: list[SimulationResult] = [
-        build_simulation_result(session, sim_id) for sim_id in sim_uuids
-    ]
+    simulations = await build_simulation_results(session, sim_uuids)
+    if panels == "descriptors":
+        simulations = [describe_panels(simulation) for simulation in simulations]
 
     overall_status: Literal["done", "pending"] = "done"
-    if any(s.status == "pending" for s in simulations):
+    if any(s["status"] == "pending" for s in simulations):
         overall_status = "pending"
 
-    return GridSimulationResult(
-        status=overall_status,
-        axes=axes,
-        simulations=simulations,
+    content = {
+        "status": overall_status,
+        # Validated on creation
+        "axes": grid.axes,
+        "simulations": simulations,
+        "cursor": cursor,
+    }
+    return Response(dumps(content), media_type="application/json")
+
+
+async def _query_grid_status(
+    session: AsyncSession, grid_id: UUID
+) -> GridSimulationStatus | None:
+    row = (
+        await session.execute(
+            select(
+                func.count(),
+                func.count().filter(db.Simulation.status == "pending"),
+                func.sum(db.Simulation.completed_steps),
+                func.sum(db.Simulation.total_steps),
+            )
+            .select_from(db.GridSimulationPoint)
+            .join(db.Simulation)
+            .where(db.GridSimulationPoint.grid_simulation_id == grid_id)
+        )
+    ).one()
+    points, pending, completed_steps, total_steps = row
+    if points == 0:
+        return None
+    return GridSimulationStatus(
+        status="pending" if pending else "done",
+        completed_steps=completed_steps,
+        total_steps=total_steps,
     )
+
+
+@router.get("/grid-simulations/{grid_id}/status")
+async def get_grid_simulation_status(
+    grid_id: UUID,
+    session: GetDB,
+) -> GridSimulationStatus:
+    status = await _query_grid_status(session, grid_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Grid simulation not found")
+    return status
+
+
+async def _get_grid_points(grid_id: UUID, state: GetState) -> dict[UUID, int]:
+    """The position of each simulation of the grid"""
+    # Not 'GetDB', whose session would be held for as long as the stream
+    async with state["session"]() as session:
+        points = {
+            row.simulation_id: row.position
+            for row in await session.execute(
+                select(
+                    db.GridSimulationPoint.simulation_id,
+                    db.GridSimulationPoint.position,
+                ).where(db.GridSimulationPoint.grid_simulation_id == grid_id)
+            )
+        }
+    if not points:
+        raise HTTPException(status_code=404, detail="Grid simulation not found")
+    return points
+
+
+@router.get("/grid-simulations/{grid_id}/events", response_class=EventSourceResponse)
+async def stream_grid_simulation_events(
+    grid_id: UUID,
+    state: GetState,
+    points: Annotated[dict[UUID, int], Depends(_get_grid_points)],
+    panels: Literal["full", "descriptors"] = "full",
+) -> AsyncIterator[ServerSentEvent]:
+    """Stream the progress of a grid simulation
+
+    Like ``GET /simulations/{id}/events``, with the position of the point in
+    each ``result`` event and a ``GridSimulationStatus`` in ``status`` events.
+    """
+    sent = dict.fromkeys(points, 0)
+    last_status: GridSimulationStatus | None = None
+    changed = set(points)
+    with state["notifications"].subscribe(points) as subscription:
+        while True:
+            async with state["session"]() as session:
+                # Read before the points, so that a final status comes after
+                # the results that led to it
+                status = await _query_grid_status(session, grid_id)
+                assert status is not None
+                if status.status != "pending":
+                    # Points may have finished since their notification
+                    changed = set(points)
+                progressed = sorted(
+                    (
+                        row.id
+                        for row in await session.execute(
+                            select(
+                                db.Simulation.id, db.Simulation.completed_steps
+                            ).where(db.Simulation.id.in_(changed))
+                        )
+                        if row.completed_steps > sent[row.id]
+                    ),
+                    key=points.__getitem__,
+                )
+                chains = {}
+                if progressed:
+                    chains = await query_chain_rows_by_simulation(session, progressed)
+
+            for simulation_id in progressed:
+                for step in finished_steps(
+                    chains[simulation_id],
+                    sent[simulation_id],
+                    points[simulation_id],
+                    panels,
+                ):
+                    yield to_event("result", step)
+                    sent[simulation_id] += 1
+            if status != last_status:
+                yield to_event("status", status)
+                last_status = status
+            if status.status != "pending":
+                return
+            # Look at all points if nothing was published, in case the grid
+            # is run by another process
+            changed = await subscription.wait(
+                SETTINGS.acidwatch_events_poll_seconds
+            ) or set(points)
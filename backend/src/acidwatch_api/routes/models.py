@@ -1,32 +1,53 @@
 from __future__ import annotations
 
+import asyncio
+import copy
+import hashlib
 import logging
 from collections import defaultdict
-from typing import Annotated
+from dataclasses import dataclass
+from typing import Annotated, Any, AsyncIterator, Coroutine, Literal, cast
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
-from pydantic import TypeAdapter, ValidationError
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.sse import EventSourceResponse, ServerSentEvent
+from opentelemetry import metrics
+from pydantic import ValidationError
 
 import acidwatch_api.database as db
+from acidwatch_api import jobs
 from acidwatch_api.authentication import (
     OptionalCurrentUser,
-    confidential_app,
+    obo_tokens,
 )
 from acidwatch_api.database import GetDB, SessionMaker
+from acidwatch_api.model_catalogue import AccessCache, build_catalogue
+from acidwatch_api.result_cache import CacheEntry, cache_key
+from acidwatch_api.result_json import (
+    describe,
+    describe_panels,
+    dumps,
+    loads,
+    simulation_result_content,
+)
+from acidwatch_api.state import AppState, GetState
+from acidwatch_api.settings import SETTINGS
 from acidwatch_api.models.datamodel import (
     AnyPanel,
     Conditions,
     ModelInfo,
     ModelInput,
-    ModelResult,
     Phase,
     Simulation,
     SimulationResult,
+    SimulationStatus,
 )
 from fastapi import Depends
+from pydantic import BaseModel
 
 
+from acidwatch_api.models.base import RunResult, get_metas, get_phases
 from acidwatch_api.models import (
     ArcsAdapter,
     ArcsExpAdapter,
@@ -36,20 +57,38 @@ from acidwatch_api.models import (
     PhpitzSolubilityAdapter,
     SolubilityCCSAdapter,
     TocomoAdapter,
-    get_parameters_schema,
     InputError,
 )
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Boolean, Table, bindparam, case, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+meter = metrics.get_meter(__name__)
+
+ABANDONED_RUNS = meter.create_counter(
+    "acidwatch.adapter.abandoned_runs",
+    description="Model runs that were given up on after exceeding their timeout",
+)
+
+RESULT_CACHE_LOOKUPS = meter.create_counter(
+    "acidwatch.result_cache.lookups",
+    description="Result cache lookups, by model and whether they were hits",
+)
+
+DEDUPLICATED_RUNS = meter.create_counter(
+    "acidwatch.adapter.deduplicated_runs",
+    description="Model runs that reused the result of an identical run in progress",
+)
+
 
 type AdapterSet = dict[str, type[BaseAdapter]]
 
+_access_cache = AccessCache(SETTINGS.acidwatch_model_access_ttl_seconds)
+
 
 def get_adapters() -> AdapterSet:
     return {
@@ -66,13 +105,19 @@ def get_adapters() -> AdapterSet:
     }
 
 
-def _check_auth(adapter: type[BaseAdapter], jwt_token: str | None) -> str | None:
+async def _check_auth(adapter: type[BaseAdapter], jwt_token: str | None) -> str | None:
     if jwt_token is None:
         return "Must be signed in"
 
     assert adapter.scope is not None
-    result = confidential_app.acquire_token_on_behalf_of(jwt_token, [adapter.scope])
-    return result.get("error_description")  # type: ignore
+    cached, error = _access_cache.get(adapter.scope, jwt_token)
+    if cached:
+        return error
+
+    result = await obo_tokens.acquire(adapter.scope, jwt_token)
+    error = result.get("error_description")
+    _access_cache.put(adapter.scope, jwt_token, error)
+    return error
 
 
 def build_adapters(
@@ -115,19 +160,26 @@ def build_adapters(
     return adapters
 
 
-def build_model_input_rows(models: list[ModelInput]) -> list[db.ModelInput]:
-    """Build the chained ``db.ModelInput`` rows for a simulation."""
-    rows: list[db.ModelInput] = []
+def build_model_input_values(
+    models: list[ModelInput], simulation_id: UUID
+) -> list[dict[str, Any]]:
+    """Build the column values of a simulation's chained ``db.ModelInput`` rows.
+
+    IDs are generated here rather than by the database, so that the rows can
+    be bulk inserted in chain order.
+    """
+    rows: list[dict[str, Any]] = []
     previous_model_input_id: UUID | None = None
     for model in models:
         model_input_id = uuid4()
         rows.append(
-            db.ModelInput(
-                id=model_input_id,
-                previous_model_input_id=previous_model_input_id,
-                model_id=model.model_id,
-                parameters=model.parameters,
-            )
+            {
+                "id": model_input_id,
+                "simulation_id": simulation_id,
+                "previous_model_input_id": previous_model_input_id,
+                "model_id": model.model_id,
+                "parameters": model.parameters,
+            }
         )
         previous_model_input_id = model_input_id
     return rows
@@ -152,41 +204,111 @@ def order_chain(
     return ordered
 
 
-def query_chain_rows(
-    session: Session, simulation_id: UUID
+async def query_chain_rows(
+    session: AsyncSession, simulation_id: UUID
 ) -> list[tuple[db.ModelInput, db.ModelResult | None]]:
     q = (
         select(db.ModelInput, db.ModelResult)
         .where(db.ModelInput.simulation_id == simulation_id)
         .outerjoin(db.ModelResult)
     )
-    return [(row[0], row[1]) for row in session.execute(q).fetchall()]
-
-
-@router.get("/models")
-def get_models(
-    user: OptionalCurrentUser, adapters: Annotated[AdapterSet, Depends(get_adapters)]
-) -> list[ModelInfo]:
-    models: list[ModelInfo] = []
-    for adapter in adapters.values():
-        access_error: str | None = (
-            _check_auth(adapter, user.jwt_token if user else None)
-            if adapter.authentication
-            else None
-        )
-        models.append(
-            ModelInfo(
-                access_error=access_error,
-                model_id=adapter.model_id,
-                display_name=adapter.display_name,
-                category=adapter.category,
-                description=adapter.description,
-                description_html=adapter.description_as_html(),
-                valid_substances=adapter.valid_substances,
-                parameters=get_parameters_schema(adapter),
-            )
+    return [(row[0], row[1]) for row in (await session.execute(q)).fetchall()]
+
+
+async def query_chain_rows_by_simulation(
+    session: AsyncSession, simulation_ids: list[UUID]
+) -> dict[UUID, list[tuple[db.ModelInput, db.ModelResult | None]]]:
+    """Like ``query_chain_rows``, for many simulations in one query"""
+    q = (
+        select(db.ModelInput, db.ModelResult)
+        .where(db.ModelInput.simulation_id.in_(simulation_ids))
+        .outerjoin(db.ModelResult)
+    )
+    rows: dict[UUID, list[tuple[db.ModelInput, db.ModelResult | None]]] = defaultdict(
+        list
+    )
+    for model_input, result in await session.execute(q):
+        rows[model_input.simulation_id].append((model_input, result))
+    return rows
+
+
+def finished_steps(
+    rows: list[tuple[db.ModelInput, db.ModelResult | None]],
+    start: int,
+    position: int | None = None,
+    panels: Literal["full", "descriptors"] = "full",
+) -> list[dict[str, Any]]:
+    """The content of a ``StepResult`` for each step of a model chain that has a
+    result, from step ``start`` on
+
+    With ``panels="descriptors"``, each panel is replaced with a
+    ``PanelDescriptor``.
+    """
+    steps: list[dict[str, Any]] = []
+    for step, (_, result) in enumerate(order_chain(rows)[start:], start):
+        if result is None:
+            break
+        content: dict[str, Any] = {"step": step, "position": position}
+        if result.error is not None:
+            steps.append({**content, "result": None, "error": result.error})
+            break
+        steps.append(
+            {
+                **content,
+                "result": {
+                    "phases": result.phases,
+                    "panels": (
+                        describe(result.panels)
+                        if panels == "descriptors"
+                        else result.panels
+                    ),
+                },
+                "error": None,
+            }
         )
-    return models
+    return steps
+
+
+def to_event(event: str, data: BaseModel | dict[str, Any]) -> ServerSentEvent:
+    if isinstance(data, BaseModel):
+        data = data.model_dump(mode="json", by_alias=True)
+    return ServerSentEvent(event=event, raw_data=dumps(data).decode())
+
+
+async def _access_error(
+    adapter: type[BaseAdapter], jwt_token: str | None
+) -> str | None:
+    if not adapter.authentication:
+        return None
+    return await _check_auth(adapter, jwt_token)
+
+
+def _if_none_match(request: Request) -> list[str]:
+    header = request.headers.get("If-None-Match", "")
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+@router.get("/models", response_model=list[ModelInfo])
+async def get_models(
+    request: Request,
+    user: OptionalCurrentUser,
+    adapters: Annotated[AdapterSet, Depends(get_adapters)],
+) -> Response:
+    catalogue = build_catalogue(tuple(adapters.values()))
+    jwt_token = user.jwt_token if user else None
+    access_errors = await asyncio.gather(
+        *(_access_error(adapter, jwt_token) for adapter in catalogue.adapters)
+    )
+    content, etag = catalogue.render(access_errors)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if etag in _if_none_match(request):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content, headers=headers)
 
 
 def _phases_to_concentrations(phases: list[Phase]) -> dict[str, int | float]:
@@ -198,148 +320,979 @@ def _phases_to_concentrations(phases: list[Phase]) -> dict[str, int | float]:
 
 
 async def run_adapters(
-    sessionmaker: SessionMaker,
+    state: AppState,
     concentrations: dict[str, int | float],
     adapters: list[BaseAdapter],
     model_input_ids: list[UUID],
 ) -> None:
     for adapter, model_input_id in zip(adapters, model_input_ids):
         adapter.set_concentrations(concentrations)
-        concentrations = await _run_adapter(
-            sessionmaker,
-            adapter,
-            model_input_id,
-        )
+        output = await _run_adapter(state, adapter, model_input_id)
+        if output is None:
+            # The simulation has failed, so the next steps are not run
+            return
+        concentrations = output
 
 
-async def _run_adapter(
-    sessionmaker: SessionMaker, adapter: BaseAdapter, model_input_id: UUID
-) -> dict[str, int | float]:
+def _abandoned(
+    adapter: BaseAdapter, timeout: float | None, terminated: bool
+) -> TimeoutError:
+    # Outside of the process pool, threads started by the adapter cannot
+    # be stopped and keep running after the timeout.
+    ABANDONED_RUNS.add(1, {"model_id": adapter.model_id, "terminated": terminated})
+    return TimeoutError(f"{adapter.display_name} did not finish within {timeout}s")
+
+
+async def _execute(state: AppState, adapter: BaseAdapter) -> RunResult:
+    process_pool = state["process_pool"]
+    in_process_pool = adapter.cpu_bound and process_pool is not None
     try:
-        result = await adapter.run()
+        if in_process_pool:
+            assert process_pool is not None
+            return await process_pool.run(adapter, adapter.timeout)
+        return await asyncio.wait_for(adapter.run(), adapter.timeout)
+    except TimeoutError:
+        raise _abandoned(adapter, adapter.timeout, in_process_pool)
 
-        phases: list[Phase]
-        panels: list[AnyPanel] = []
-        if isinstance(result, list):
-            phases = result
-        else:
-            phases, *panels = result
 
-        phases = adapter.merge_passthrough(phases)
+async def _execute_batch(
+    state: AppState,
+    adapter: BaseAdapter,
+    concentrations: list[dict[str, int | float]],
+) -> list[RunResult | Exception]:
+    process_pool = state["process_pool"]
+    in_process_pool = adapter.cpu_bound and process_pool is not None
+    # The adapter's timeout applies to each composition
+    timeout = (
+        adapter.timeout * len(concentrations) if adapter.timeout is not None else None
+    )
+    try:
+        if in_process_pool:
+            assert process_pool is not None
+            results = await process_pool.run_batch(adapter, concentrations, timeout)
+        else:
+            results = await asyncio.wait_for(adapter.run_batch(concentrations), timeout)
+    except TimeoutError:
+        raise _abandoned(adapter, timeout, in_process_pool)
 
-        result_obj = db.ModelResult(
-            model_input_id=model_input_id,
-            phases=[p.model_dump() for p in phases],
-            panels=[p.model_dump(mode="json", by_alias=True) for p in panels],
-            error=None,
+    if len(results) != len(concentrations):
+        raise RuntimeError(
+            f"{adapter.display_name} returned {len(results)} results "
+            f"for {len(concentrations)} compositions"
         )
+    return results
 
-        return _phases_to_concentrations(phases)
-    except BaseException as exc:
+
+async def _authorize_shared(adapter: BaseAdapter) -> None:
+    """Ensure that the user may see results computed for someone else"""
+    if adapter.authentication and (
+        error := await _check_auth(type(adapter), adapter.jwt_token)
+    ):
+        raise PermissionError(error)
+
+
+def _to_entry(result: RunResult) -> CacheEntry:
+    return CacheEntry(
+        phases=[p.model_dump() for p in get_phases(result)],
+        panels=[p.model_dump(mode="json", by_alias=True) for p in get_metas(result)],
+    )
+
+
+async def _lookup(state: AppState, adapter: BaseAdapter, key: str) -> CacheEntry | None:
+    cache = state["result_cache"]
+    if cache is None:
+        return None
+
+    entry = await cache.get(key)
+    RESULT_CACHE_LOOKUPS.add(
+        1, {"model_id": adapter.model_id, "hit": entry is not None}
+    )
+    if entry is not None:
+        await _authorize_shared(adapter)
+    return entry
+
+
+async def _run_uncached(state: AppState, adapter: BaseAdapter, key: str) -> CacheEntry:
+    async with state["bulkheads"].slot(adapter):
+        entry = _to_entry(await _execute(state, adapter))
+
+    if (cache := state["result_cache"]) is not None:
+        await cache.put(key, adapter.model_id, entry)
+    return entry
+
+
+async def _run_cached(state: AppState, adapter: BaseAdapter) -> CacheEntry:
+    """Run the adapter, or share the result of an identical earlier or ongoing run"""
+    key = cache_key(adapter)
+    if (entry := await _lookup(state, adapter, key)) is not None:
+        return entry
+
+    entry, shared = await state["in_flight"].run(
+        key, lambda: _run_uncached(state, adapter, key)
+    )
+    if shared:
+        DEDUPLICATED_RUNS.add(1, {"model_id": adapter.model_id})
+        await _authorize_shared(adapter)
+    return entry
+
+
+async def _run_batch_cached(
+    state: AppState, adapters: list[BaseAdapter]
+) -> list[CacheEntry | Exception]:
+    """Run adapters that differ only in their concentrations as one batch,
+    skipping those with a cached result"""
+    keys = [cache_key(adapter) for adapter in adapters]
+    outcomes: list[CacheEntry | Exception | None] = []
+    for adapter, key in zip(adapters, keys):
+        try:
+            outcomes.append(await _lookup(state, adapter, key))
+        except Exception as exc:
+            outcomes.append(exc)
+
+    misses = [index for index, outcome in enumerate(outcomes) if outcome is None]
+    if misses:
+        # run_batch changes the concentrations of the adapter it is called on
+        batch_adapter = copy.copy(adapters[misses[0]])
+        results: list[RunResult | Exception]
+        try:
+            async with state["bulkheads"].slot(batch_adapter):
+                results = await _execute_batch(
+                    state,
+                    batch_adapter,
+                    [adapters[index].concentrations for index in misses],
+                )
+        except Exception as exc:
+            results = [exc] * len(misses)
+
+        cache = state["result_cache"]
+        for index, result in zip(misses, results):
+            if isinstance(result, Exception):
+                outcomes[index] = result
+                continue
+            outcomes[index] = entry = _to_entry(result)
+            if cache is not None:
+                await cache.put(keys[index], batch_adapter.model_id, entry)
+
+    return [outcome for outcome in outcomes if outcome is not None]
+
+
+def _result_row(
+    adapter: BaseAdapter, model_input_id: UUID, outcome: CacheEntry | BaseException
+) -> tuple[db.ModelResult, dict[str, int | float] | None]:
+    """The result to store for a step, and the concentrations to pass to the next
+    step, or None if it failed"""
+    if isinstance(outcome, BaseException):
         # Full traceback goes to logs (App Insights); only a short message
         # is persisted for surfacing to the API caller.
-        logger.exception(
+        logger.error(
             "Adapter %s failed for model_input %s",
             adapter.model_id,
             model_input_id,
+            exc_info=outcome,
         )
         result_obj = db.ModelResult(
             model_input_id=model_input_id,
             phases=[],
             panels=[],
-            error=f"{type(exc).__name__}: {exc}",
+            error=f"{type(outcome).__name__}: {outcome}",
         )
-        return {}
+        return result_obj, None
+
+    phases = adapter.merge_passthrough(
+        [Phase.model_validate(p) for p in outcome.phases]
+    )
+    result_obj = db.ModelResult(
+        model_input_id=model_input_id,
+        phases=[p.model_dump() for p in phases],
+        panels=outcome.panels,
+        error=None,
+    )
+    return result_obj, _phases_to_concentrations(phases)
+
+
+# Core table, so that updating many rows is a plain executemany and not an ORM
+# bulk update by primary key
+_simulations = cast(Table, db.Simulation.__table__)
+
+# Counts one more step of the simulation that a result belongs to as completed
+_COMPLETE_STEP = (
+    update(_simulations)
+    .where(
+        _simulations.c.id
+        == select(db.ModelInput.simulation_id)
+        .where(db.ModelInput.id == bindparam("step_id"))
+        .scalar_subquery()
+    )
+    .values(
+        completed_steps=_simulations.c.completed_steps + 1,
+        status=case(
+            (
+                or_(
+                    _simulations.c.status == "error",
+                    bindparam("failed", type_=Boolean),
+                ),
+                "error",
+            ),
+            (
+                _simulations.c.completed_steps + 1 >= _simulations.c.total_steps,
+                "done",
+            ),
+            else_="pending",
+        ),
+    )
+)
+
+
+_grid_simulations = cast(Table, db.GridSimulation.__table__)
+_grid_points = cast(Table, db.GridSimulationPoint.__table__)
+
+_SET_COMPLETION_INDEX = (
+    update(_grid_points)
+    .where(_grid_points.c.id == bindparam("point_id"))
+    .values(completion_index=bindparam("index"))
+)
+
+_STORE_SNAPSHOT = (
+    update(_simulations)
+    .where(_simulations.c.id == bindparam("simulation_id"))
+    .values(result_snapshot=bindparam("snapshot"), result_etag=bindparam("etag"))
+)
+
+# Results of finished simulations never change, so they are cached for a year
+_FINISHED_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _snapshot(content: dict[str, Any]) -> tuple[str, str]:
+    """Serialize a result, and compute its strong ETag"""
+    snapshot = dumps(content)
+    etag = hashlib.sha256(snapshot).hexdigest()[:32]
+    return snapshot.decode(), f'"{etag}"'
+
+
+async def _number_finished_points(
+    session: AsyncSession, simulation_ids: list[UUID]
+) -> None:
+    """Give newly finished grid points the next completion indices of their grid
+
+    Incrementing the grid's counter locks its row until the transaction ends,
+    so indices are handed out in commit order and a reader that sees the
+    counter also sees every point up to it.
+    """
+    points: dict[UUID, list[UUID]] = defaultdict(list)
+    for row in await session.execute(
+        select(db.GridSimulationPoint.id, db.GridSimulationPoint.grid_simulation_id)
+        .where(db.GridSimulationPoint.simulation_id.in_(simulation_ids))
+        .order_by(db.GridSimulationPoint.position)
+    ):
+        points[row.grid_simulation_id].append(row.id)
+
+    for grid_id, point_ids in points.items():
+        last = await session.scalar(
+            update(_grid_simulations)
+            .where(_grid_simulations.c.id == grid_id)
+            .values(
+                completed_points=_grid_simulations.c.completed_points + len(point_ids)
+            )
+            .returning(_grid_simulations.c.completed_points)
+        )
+        assert last is not None
+        first = last - len(point_ids) + 1
+        await session.execute(
+            _SET_COMPLETION_INDEX,
+            [
+                {"point_id": point_id, "index": index}
+                for index, point_id in enumerate(point_ids, first)
+            ],
+        )
+
+
+async def store_snapshots(
+    session: AsyncSession, simulation_ids: list[UUID]
+) -> dict[UUID, tuple[str, str]]:
+    """Build and store the results of finished simulations"""
+    snapshots = {
+        simulation_id: _snapshot(content)
+        for simulation_id, content in zip(
+            simulation_ids, await build_simulation_results(session, simulation_ids)
+        )
+    }
+    if snapshots:
+        await session.execute(
+            _STORE_SNAPSHOT,
+            [
+                {"simulation_id": simulation_id, "snapshot": snapshot, "etag": etag}
+                for simulation_id, (snapshot, etag) in snapshots.items()
+            ],
+        )
+    return snapshots
+
+
+async def _save_results(
+    session: AsyncSession, results: list[db.ModelResult]
+) -> list[UUID]:
+    """Add step results and update their simulations' status in one transaction
+
+    Simulations that are finished by these results get their result snapshot
+    and, if they are grid points, their completion index.
+
+    Returns:
+        The simulations that the results belong to.
+
+    """
+    session.add_all(results)
+    await session.execute(
+        _COMPLETE_STEP,
+        [
+            {"step_id": result.model_input_id, "failed": result.error is not None}
+            for result in results
+        ],
+    )
+
+    simulations = (
+        await session.execute(
+            select(
+                db.Simulation.id, db.Simulation.status, db.Simulation.result_etag
+            ).where(
+                db.Simulation.id.in_(
+                    select(db.ModelInput.simulation_id).where(
+                        db.ModelInput.id.in_([r.model_input_id for r in results])
+                    )
+                )
+            )
+        )
+    ).all()
+    finished = [
+        row.id
+        for row in simulations
+        if row.status != "pending" and row.result_etag is None
+    ]
+    if finished:
+        await _number_finished_points(session, finished)
+        await store_snapshots(session, finished)
+    return [row.id for row in simulations]
+
+
+async def _store_results(state: AppState, results: list[db.ModelResult]) -> None:
+    """Save step results and notify the subscribers of their simulations"""
+    async with db.begin_session(state["session"]) as session:
+        simulation_ids = await _save_results(session, results)
+    await state["notifications"].publish(simulation_ids)
+
+
+async def _run_adapter(
+    state: AppState, adapter: BaseAdapter, model_input_id: UUID
+) -> dict[str, int | float] | None:
+    outcome: CacheEntry | BaseException
+    try:
+        outcome = await _run_cached(state, adapter)
+    except asyncio.CancelledError:
+        # The worker is shutting down or lost its lease. Leave the step
+        # without a result so that the job can be resumed elsewhere.
+        raise
+    except BaseException as exc:
+        outcome = exc
+
+    result_obj, concentrations = _result_row(adapter, model_input_id, outcome)
+    await _store_results(state, [result_obj])
+    return concentrations
+
+
+async def _run_step(
+    state: AppState,
+    adapter: BaseAdapter,
+    concentrations: list[dict[str, int | float]],
+    model_input_ids: list[UUID],
+    concurrency: int,
+) -> list[dict[str, int | float] | None]:
+    """Run one step of a model chain for many compositions
+
+    Adapters that implement ``run_batch`` get all compositions at once. Others
+    are run once per composition, at most ``concurrency`` at a time.
+
+    Returns:
+        The output concentrations of each composition, or None where the
+        step failed.
 
+    """
+    adapters: list[BaseAdapter] = []
+    for value in concentrations:
+        # Copying avoids validating the same parameters once per composition
+        point_adapter = copy.copy(adapter)
+        point_adapter.set_concentrations(value)
+        adapters.append(point_adapter)
+
+    if type(adapter).run_batch is BaseAdapter.run_batch:
+        limit = asyncio.Semaphore(concurrency)
+
+        async def _run(point_adapter: BaseAdapter, model_input_id: UUID) -> Any:
+            async with limit:
+                return await _run_adapter(state, point_adapter, model_input_id)
+
+        return list(await asyncio.gather(*map(_run, adapters, model_input_ids)))
+
+    outcomes = await _run_batch_cached(state, adapters)
+    rows = [
+        _result_row(point_adapter, model_input_id, outcome)
+        for point_adapter, model_input_id, outcome in zip(
+            adapters, model_input_ids, outcomes
+        )
+    ]
+    await _store_results(state, [result_obj for result_obj, _ in rows])
+    return [point_concentrations for _, point_concentrations in rows]
+
+
+async def _keep_leases(
+    sessionmaker: SessionMaker,
+    job_ids: list[UUID],
+    owner: str,
+    runner: asyncio.Task[Any],
+) -> None:
+    interval = SETTINGS.acidwatch_job_lease_seconds / 3
+    while True:
+        await asyncio.sleep(interval)
+        for job_id in job_ids:
+            try:
+                renewed = await jobs.renew_lease(sessionmaker, job_id, owner)
+            except Exception:
+                # The lease lasts for a few heartbeats, so try again at the next
+                logger.exception("Could not renew lease on job %s", job_id)
+                continue
+            if not renewed:
+                logger.warning("Lost lease on job %s, abandoning it", job_id)
+                runner.cancel()
+                return
+
+
+async def _run_leased[T](
+    sessionmaker: SessionMaker,
+    job_ids: list[UUID],
+    owner: str,
+    work: Coroutine[Any, Any, T],
+) -> T:
+    """Run ``work`` for leased jobs, heartbeating their leases
+
+    Raises:
+        jobs.LeaseLost: If another worker took over one of the jobs. ``work``
+            is cancelled, but not the caller.
+
+    """
+    runner = asyncio.create_task(work)
+    heartbeat = asyncio.create_task(_keep_leases(sessionmaker, job_ids, owner, runner))
+    try:
+        return await runner
+    except asyncio.CancelledError:
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise
+        raise jobs.LeaseLost(job_ids)
     finally:
-        async with db.begin_session(sessionmaker) as session:
-            session.add(result_obj)
+        heartbeat.cancel()
+
+
+@dataclass
+class _PendingSteps:
+    """The steps of a job's model chain that have no result yet"""
+
+    job: db.SimulationJob
+    conditions: Conditions
+    # Input to the first pending step
+    concentrations: dict[str, int | float]
+    rows: list[db.ModelInput]
+
 
+async def _load_pending_steps(
+    sessionmaker: SessionMaker, job: db.SimulationJob
+) -> _PendingSteps:
+    async with db.begin_session(sessionmaker) as session:
+        simulation = await session.get_one(db.Simulation, job.simulation_id)
+        chain = order_chain(await query_chain_rows(session, job.simulation_id))
 
-def build_simulation_result(session: Session, simulation_id: UUID) -> SimulationResult:
-    db_simulation = session.get_one(db.Simulation, simulation_id)
+    concentrations = _phases_to_concentrations([Phase(**p) for p in simulation.phases])
+    pending: list[db.ModelInput] = []
+    for model_input, result in chain:
+        if result is None:
+            pending.append(model_input)
+        elif result.error is not None:
+            # The simulation has failed, so its remaining steps are not run
+            pending = []
+            break
+        else:
+            concentrations = _phases_to_concentrations(
+                [Phase(**p) for p in result.phases]
+            )
+
+    return _PendingSteps(
+        job=job,
+        conditions=Conditions(**(simulation.conditions or {})),
+        concentrations=concentrations,
+        rows=pending,
+    )
 
-    model_inputs: list[ModelInput] = []
-    results: list[ModelResult] = []
-    pending = False
 
-    for model_input, result in order_chain(query_chain_rows(session, simulation_id)):
-        model_inputs.append(
-            ModelInput(
-                model_id=model_input.model_id,
-                parameters=model_input.parameters,
+async def _fail_step(state: AppState, model_input_id: UUID, error: str) -> None:
+    await _store_results(
+        state,
+        [
+            db.ModelResult(
+                model_input_id=model_input_id, phases=[], panels=[], error=error
             )
+        ],
+    )
+
+
+async def _fail_job(state: AppState, job: db.SimulationJob) -> None:
+    """End a job's simulation after an unexpected error
+
+    The first step without a result gets an error, so that the simulation is
+    no longer pending.
+    """
+    steps = await _load_pending_steps(state["session"], job)
+    if steps.rows:
+        await _fail_step(
+            state, steps.rows[0].id, "Simulation failed due to an internal error"
         )
 
-        if not result:
-            pending = True
-            continue
 
-        if result.error is not None:
-            logger.error("Simulation %s failed: %s", simulation_id, result.error)
-            return SimulationResult(
-                status="error",
-                input=Simulation(
-                    concentrations=_phases_to_concentrations(
-                        [Phase(**p) for p in db_simulation.phases]
-                    ),
-                    conditions=Conditions(**(db_simulation.conditions or {})),
-                    models=model_inputs,
-                ),
-                results=results,
-                error=result.error,
+async def _exceeded_attempts(state: AppState, steps: _PendingSteps) -> bool:
+    """Fail the next step if the job has been attempted too many times"""
+    attempts = steps.job.attempts
+    if attempts <= SETTINGS.acidwatch_job_max_attempts:
+        return False
+
+    await _fail_step(
+        state,
+        steps.rows[0].id,
+        f"Simulation was abandoned after {attempts - 1} attempts",
+    )
+    return True
+
+
+def _build_pending_adapters(
+    steps: _PendingSteps, all_adapters: AdapterSet, jwt_token: str | None
+) -> list[BaseAdapter]:
+    return build_adapters(
+        [
+            ModelInput(model_id=row.model_id, parameters=row.parameters)
+            for row in steps.rows
+        ],
+        steps.conditions,
+        all_adapters,
+        jwt_token,
+    )
+
+
+def _missing_sign_in(adapters: list[BaseAdapter], jwt_token: str | None) -> str | None:
+    """Explain why a job cannot run models on the user's behalf
+
+    Users' tokens are not stored with jobs, so jobs that are resumed or run by
+    a dedicated worker have none.
+    """
+    if jwt_token is not None:
+        return None
+    for adapter in adapters:
+        if adapter.authentication or adapter.scope is not None:
+            return (
+                f"{adapter.display_name} must be run on behalf of a signed-in "
+                "user, which is only possible while the simulation is run by "
+                "the API that received it. Sign in and submit the simulation again"
             )
+    return None
 
-        results.append(
-            ModelResult(
-                phases=[Phase(**p) for p in result.phases],
-                panels=result.panels,
+
+async def _run_pending_steps(
+    state: AppState,
+    job: db.SimulationJob,
+    all_adapters: AdapterSet,
+    jwt_token: str | None,
+) -> jobs.JobStatus:
+    sessionmaker = state["session"]
+    steps = await _load_pending_steps(sessionmaker, job)
+    if not steps.rows:
+        return "done"
+
+    if await _exceeded_attempts(state, steps):
+        return "failed"
+
+    try:
+        adapters = _build_pending_adapters(steps, all_adapters, jwt_token)
+    except HTTPException as exc:
+        await _fail_step(state, steps.rows[0].id, f"Invalid model chain: {exc.detail}")
+        return "failed"
+
+    if error := _missing_sign_in(adapters, jwt_token):
+        await _fail_step(state, steps.rows[0].id, error)
+        return "failed"
+
+    await run_adapters(
+        state, steps.concentrations, adapters, [row.id for row in steps.rows]
+    )
+    return "done"
+
+
+async def _run_grid_steps(
+    state: AppState,
+    claimed: list[db.SimulationJob],
+    all_adapters: AdapterSet,
+    concurrency: int,
+    jwt_token: str | None,
+) -> dict[UUID, jobs.JobStatus]:
+    sessionmaker = state["session"]
+    statuses: dict[UUID, jobs.JobStatus] = {}
+    points: list[_PendingSteps] = []
+    for job in claimed:
+        steps = await _load_pending_steps(sessionmaker, job)
+        if not steps.rows:
+            statuses[job.id] = "done"
+        elif await _exceeded_attempts(state, steps):
+            statuses[job.id] = "failed"
+        else:
+            points.append(steps)
+
+    if not points:
+        return statuses
+
+    # All points share the model chain, so it is built and validated once.
+    # Points that were resumed may have fewer pending steps than others.
+    longest = max(points, key=lambda steps: len(steps.rows))
+    try:
+        adapters = _build_pending_adapters(longest, all_adapters, jwt_token)
+    except HTTPException as exc:
+        for steps in points:
+            await _fail_step(
+                state, steps.rows[0].id, f"Invalid model chain: {exc.detail}"
             )
+            statuses[steps.job.id] = "failed"
+        return statuses
+
+    if error := _missing_sign_in(adapters, jwt_token):
+        for steps in points:
+            await _fail_step(state, steps.rows[0].id, error)
+            statuses[steps.job.id] = "failed"
+        return statuses
+
+    failed: set[UUID] = set()
+    for index, adapter in enumerate(adapters):
+        remaining = len(adapters) - index
+        step_points = [
+            steps
+            for steps in points
+            if len(steps.rows) >= remaining and steps.job.id not in failed
+        ]
+        results = await _run_step(
+            state,
+            adapter,
+            [steps.concentrations for steps in step_points],
+            [steps.rows[-remaining].id for steps in step_points],
+            concurrency,
         )
+        for steps, concentrations in zip(step_points, results):
+            if concentrations is None:
+                # The point's simulation has failed, so its next steps are
+                # not run
+                failed.add(steps.job.id)
+            else:
+                steps.concentrations = concentrations
 
-    simulation_input = Simulation(
-        concentrations=_phases_to_concentrations(
-            [Phase(**p) for p in db_simulation.phases]
-        ),
-        conditions=Conditions(**(db_simulation.conditions or {})),
-        models=model_inputs,
+    statuses.update((steps.job.id, "done") for steps in points)
+    return statuses
+
+
+async def run_job(
+    state: AppState,
+    job: db.SimulationJob,
+    owner: str,
+    all_adapters: AdapterSet | None = None,
+    jwt_token: str | None = None,
+) -> None:
+    """Run the remaining steps of a leased job, heartbeating its lease
+
+    Args:
+        jwt_token: The token of the user that submitted the job, if this is
+            the request that enqueued it. Jobs are resumed without it, so
+            models that need a signed-in user fail.
+
+    """
+    sessionmaker = state["session"]
+    try:
+        status = await _run_leased(
+            sessionmaker,
+            [job.id],
+            owner,
+            _run_pending_steps(state, job, all_adapters or get_adapters(), jwt_token),
+        )
+    except asyncio.CancelledError:
+        await jobs.finish_job(sessionmaker, job.id, owner, "queued")
+        raise
+    except jobs.LeaseLost:
+        # The job is now run by the worker that took it over
+        return
+    except Exception:
+        logger.exception("Job %s failed", job.id)
+        await _fail_job(state, job)
+        status = "failed"
+
+    await jobs.finish_job(sessionmaker, job.id, owner, status)
+
+
+async def run_jobs(
+    state: AppState,
+    job_ids: list[UUID],
+    all_adapters: AdapterSet,
+    concurrency: int = 1,
+    jwt_token: str | None = None,
+) -> None:
+    """Claim and run specific jobs in this process, at most ``concurrency`` at a time"""
+    owner = jobs.worker_id()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def _run(job_id: UUID) -> None:
+        async with limit:
+            job = await jobs.claim_job(state["session"], owner, job_id)
+            if job is not None:
+                await run_job(state, job, owner, all_adapters, jwt_token)
+
+    await asyncio.gather(*(_run(job_id) for job_id in job_ids))
+
+
+async def run_grid_jobs(
+    state: AppState,
+    job_ids: list[UUID],
+    all_adapters: AdapterSet,
+    concurrency: int = 1,
+    jwt_token: str | None = None,
+) -> None:
+    """Claim and run the jobs of a grid simulation in this process
+
+    Each step of the model chain is run for all grid points before the next
+    one, so that adapters implementing ``run_batch`` get the whole grid at
+    once. Other adapters are run at most ``concurrency`` points at a time.
+    """
+    sessionmaker = state["session"]
+    owner = jobs.worker_id()
+    claimed: list[db.SimulationJob] = []
+    for job_id in job_ids:
+        if (job := await jobs.claim_job(sessionmaker, owner, job_id)) is not None:
+            claimed.append(job)
+    if not claimed:
+        return
+
+    statuses: dict[UUID, jobs.JobStatus] = {}
+    try:
+        statuses = await _run_leased(
+            sessionmaker,
+            [job.id for job in claimed],
+            owner,
+            _run_grid_steps(state, claimed, all_adapters, concurrency, jwt_token),
+        )
+    except asyncio.CancelledError:
+        for job in claimed:
+            await jobs.finish_job(sessionmaker, job.id, owner, "queued")
+        raise
+    except jobs.LeaseLost:
+        # Put the other jobs back on the queue, the lost one is now run by
+        # the worker that took it over
+        for job in claimed:
+            await jobs.finish_job(sessionmaker, job.id, owner, "queued")
+        return
+    except Exception:
+        logger.exception("Grid jobs %s failed", [job.id for job in claimed])
+        for job in claimed:
+            await _fail_job(state, job)
+
+    for job in claimed:
+        await jobs.finish_job(
+            sessionmaker, job.id, owner, statuses.get(job.id, "failed")
+        )
+
+
+async def build_simulation_result(
+    session: AsyncSession, simulation_id: UUID
+) -> dict[str, Any]:
+    """Build the content of a simulation's ``SimulationResult``"""
+    db_simulation = await session.get_one(db.Simulation, simulation_id)
+    return simulation_result_content(
+        db_simulation, order_chain(await query_chain_rows(session, simulation_id))
     )
 
-    if pending:
-        return SimulationResult(
-            status="pending", input=simulation_input, results=results
+
+async def build_simulation_results(
+    session: AsyncSession, simulation_ids: list[UUID]
+) -> list[dict[str, Any]]:
+    """Build the results of many simulations with a constant number of queries"""
+    simulations = {
+        simulation.id: simulation
+        for simulation in await session.scalars(
+            select(db.Simulation).where(db.Simulation.id.in_(simulation_ids))
+        )
+    }
+    chains = await query_chain_rows_by_simulation(session, simulation_ids)
+    return [
+        simulation_result_content(
+            simulations[simulation_id], order_chain(chains[simulation_id])
         )
+        for simulation_id in simulation_ids
+    ]
 
-    return SimulationResult(
-        status="done",
-        input=simulation_input,
-        results=[
-            ModelResult(
-                phases=result.phases,
-                panels=[
-                    TypeAdapter(AnyPanel).validate_python(panel)
-                    for panel in result.panels
-                ],
-            )
-            for result in results
-            if result is not None
-        ],
+
+@router.get("/simulations/{simulation_id}/result", response_model=SimulationResult)
+async def get_result_for_simulation(
+    simulation_id: UUID,
+    request: Request,
+    session: GetDB,
+    panels: Literal["full", "descriptors"] = "full",
+) -> Response:
+    """Get the result of a simulation
+
+    With ``panels=descriptors``, each panel is replaced with a
+    ``PanelDescriptor``. Fetch the panels that are needed with
+    ``GET /simulations/{id}/steps/{n}/panels/{k}``.
+    """
+    row = (
+        await session.execute(
+            select(
+                db.Simulation.status,
+                db.Simulation.result_snapshot,
+                db.Simulation.result_etag,
+            ).where(db.Simulation.id == simulation_id)
+        )
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+
+    if row.status == "pending":
+        content = await build_simulation_result(session, simulation_id)
+        if panels == "descriptors":
+            content = describe_panels(content)
+        return Response(
+            dumps(content),
+            media_type="application/json",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    if row.result_snapshot is None or row.result_etag is None:
+        # Finished before snapshots were stored
+        snapshot, etag = (await store_snapshots(session, [simulation_id]))[
+            simulation_id
+        ]
+    else:
+        snapshot, etag = row.result_snapshot, row.result_etag
+    if panels == "descriptors":
+        etag = f'{etag[:-1]}-descriptors"'
+
+    headers = {"ETag": etag, "Cache-Control": _FINISHED_CACHE_CONTROL}
+    if etag in _if_none_match(request):
+        return Response(status_code=304, headers=headers)
+    if panels == "descriptors":
+        snapshot = dumps(describe_panels(loads(snapshot))).decode()
+    return Response(snapshot, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/simulations/{simulation_id}/steps/{step}/panels/{index}",
+    response_model=AnyPanel,
+)
+async def get_simulation_panel(
+    simulation_id: UUID, step: int, index: int, session: GetDB
+) -> Response:
+    """Get a panel of a finished step of a simulation"""
+    chain = order_chain(await query_chain_rows(session, simulation_id))
+    if not chain:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    result = chain[step][1] if 0 <= step < len(chain) else None
+    if result is None or not 0 <= index < len(result.panels):
+        raise HTTPException(status_code=404, detail="Panel not found")
+    return Response(
+        dumps(result.panels[index]),
+        media_type="application/json",
+        headers={"Cache-Control": _FINISHED_CACHE_CONTROL},
     )
 
 
-@router.get("/simulations/{simulation_id}/result")
-def get_result_for_simulation(
+async def query_simulation_status(
+    session: AsyncSession, simulation_id: UUID
+) -> SimulationStatus | None:
+    row = (
+        await session.execute(
+            select(
+                db.Simulation.status,
+                db.Simulation.completed_steps,
+                db.Simulation.total_steps,
+            ).where(db.Simulation.id == simulation_id)
+        )
+    ).one_or_none()
+    if row is None:
+        return None
+    return SimulationStatus(
+        status=row.status,
+        completed_steps=row.completed_steps,
+        total_steps=row.total_steps,
+    )
+
+
+@router.get("/simulations/{simulation_id}/status")
+async def get_simulation_status(
     simulation_id: UUID,
     session: GetDB,
-) -> SimulationResult:
-    return build_simulation_result(session, simulation_id)
+) -> SimulationStatus:
+    status = await query_simulation_status(session, simulation_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return status
+
+
+async def _check_simulation_exists(simulation_id: UUID, state: GetState) -> None:
+    # Not 'GetDB', whose session would be held for as long as the stream
+    async with state["session"]() as session:
+        if await query_simulation_status(session, simulation_id) is None:
+            raise HTTPException(status_code=404, detail="Simulation not found")
+
+
+@router.get(
+    "/simulations/{simulation_id}/events",
+    response_class=EventSourceResponse,
+    dependencies=[Depends(_check_simulation_exists)],
+)
+async def stream_simulation_events(
+    simulation_id: UUID,
+    state: GetState,
+    panels: Literal["full", "descriptors"] = "full",
+) -> AsyncIterator[ServerSentEvent]:
+    """Stream the progress of a simulation
+
+    Sends a ``result`` event with a ``StepResult`` for each finished step, and
+    a ``status`` event with a ``SimulationStatus`` whenever it changes. The
+    stream ends once the simulation is done or has failed.
+
+    With ``panels=descriptors``, the panels of each ``StepResult`` are
+    ``PanelDescriptor``s, as in ``GET /simulations/{id}/result``.
+    """
+    sent = 0
+    last_status: SimulationStatus | None = None
+    with state["notifications"].subscribe([simulation_id]) as subscription:
+        while True:
+            rows = []
+            async with state["session"]() as session:
+                status = await query_simulation_status(session, simulation_id)
+                assert status is not None
+                if status.completed_steps > sent:
+                    rows = await query_chain_rows(session, simulation_id)
+
+            for step in finished_steps(rows, sent, panels=panels):
+                yield to_event("result", step)
+                sent += 1
+            if status != last_status:
+                yield to_event("status", status)
+                last_status = status
+            if status.status != "pending":
+                return
+            await subscription.wait(SETTINGS.acidwatch_events_poll_seconds)
 
 
 @router.post("/simulations")
 async def run_simulation(
     create_simulation: Simulation,
     user: OptionalCurrentUser,
-    request: Request,
+    state: GetState,
     session: GetDB,
     background_tasks: BackgroundTasks,
     all_adapters: Annotated[AdapterSet, Depends(get_adapters)],
@@ -357,23 +1310,33 @@ async def run_simulation(
     except InputError as exc:
         raise HTTPException(status_code=422, detail=exc.detail)
 
-    model_inputs = build_model_input_rows(create_simulation.models)
-
+    simulation_id = uuid4()
     simulation = db.Simulation(
+        id=simulation_id,
         owner_id=UUID(user.id) if user else None,
         phases=[p.model_dump() for p in create_simulation.phases],
         conditions=create_simulation.conditions.model_dump(),
-        model_inputs=model_inputs,
+        total_steps=len(create_simulation.models),
+        model_inputs=[
+            db.ModelInput(**values)
+            for values in build_model_input_values(
+                create_simulation.models, simulation_id
+            )
+        ],
     )
     session.add(simulation)
-    session.commit()
-
-    background_tasks.add_task(
-        run_adapters,
-        request.state.session,
-        concentrations,
-        adapters,
-        [model_input.id for model_input in simulation.model_inputs],
-    )
 
-    return simulation.id
+    job = jobs.new_job(simulation_id)
+    session.add(job)
+    await session.commit()
+
+    if SETTINGS.acidwatch_inline_worker:
+        background_tasks.add_task(
+            run_jobs,
+            state,
+            [job.id],
+            all_adapters,
+            jwt_token=user.jwt_token if user else None,
+        )
+
+    return simulation_id
@@ -17,7 +17,7 @@ router = APIRouter()
 
 @router.get("/oasis")
 async def get_oasis(user: CurrentUser) -> list[dict[str, Any]]:
-    token = acquire_token_for_downstream_api(
+    token = await acquire_token_for_downstream_api(
         f"{SETTINGS.oasis_uri}/.default", user.jwt_token
     )
     response = requests.get(
@@ -9,6 +9,40 @@ class Settings(BaseSettings):
     acidwatch_database: str = "sqlite://"
     acidwatch_test_database: str = ""
 
+    # When enabled, the API process runs the simulation jobs it enqueues
+    # itself. Disable it when dedicated `acidwatch-api-worker` processes are
+    # deployed.
+    acidwatch_inline_worker: bool = True
+    acidwatch_job_lease_seconds: float = 60
+    # How often the inline worker looks for jobs to resume, ie. jobs queued
+    # or leased by an API process that has since stopped.
+    acidwatch_job_poll_seconds: float = 10
+    acidwatch_job_max_attempts: int = 3
+    # Maximum number of points of a single grid simulation that are run at
+    # the same time.
+    acidwatch_grid_concurrency: int = 8
+    # Number of worker processes for running CPU-bound models (eg. neqsim)
+    # outside of the event loop. 0 runs them in the API or worker process,
+    # where runs that time out cannot be stopped.
+    acidwatch_process_pool_size: int = 2
+    # Reuse the results of earlier model runs with identical inputs.
+    acidwatch_result_cache: bool = True
+    # Size and lifetime of each process's in-memory tier of the result cache
+    acidwatch_result_cache_memory_bytes: int = 64 * 1024 * 1024
+    acidwatch_result_cache_ttl_seconds: float = 3600
+    # Connection pool of each shared HTTP client for remote models. HTTP/2
+    # requires the 'h2' package.
+    acidwatch_http_max_connections: int = 100
+    acidwatch_http_max_keepalive_connections: int = 20
+    acidwatch_http_keepalive_expiry: float = 30
+    acidwatch_http2: bool = False
+    # How long GET /models remembers whether a user may use an authenticated
+    # model.
+    acidwatch_model_access_ttl_seconds: float = 60
+    # How often the event streams of running simulations check the database
+    # for progress made by other processes.
+    acidwatch_events_poll_seconds: float = 2
+
     frontend_client_id: str = "49385006-e775-4109-9635-2f1a2bdc8ea8"
     backend_client_id: str = "456cc109-08d7-4c11-bf2e-a7b26660f99e"
     backend_client_secret: str | None = None
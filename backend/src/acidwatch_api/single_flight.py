@@ -0,0 +1,44 @@
+"""Deduplication of concurrent identical work.
+
+When several callers ask for the same key at the same time, only the first
+one does the work. The others wait for its result, so concurrent identical
+model runs (eg. from different users or from points of the same grid) reach
+the model only once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable
+
+
+class SingleFlight[T]:
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Await ``fn()``, or the pending call with the same key
+
+        Returns:
+            The result, and whether it was shared with an earlier caller.
+
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+
+        # Cancelling one caller must not cancel the work for the others
+        return await asyncio.shield(task), shared
+
+    def _done(self, key: str, task: asyncio.Task[T]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled
+            task.exception()
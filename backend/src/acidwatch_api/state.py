@@ -0,0 +1,79 @@
+"""Per-process application state, shared by the API and the workers"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator, TypeAlias, TypedDict, cast
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from acidwatch_api.bulkheads import Bulkheads
+from acidwatch_api.database import SessionMaker, open_database
+from acidwatch_api.http_clients import HTTP_CLIENTS
+from acidwatch_api.notifications import NotificationBus
+from acidwatch_api.process_pool import ProcessPool
+from acidwatch_api.result_cache import CacheEntry, MemoryCache, ResultCache
+from acidwatch_api.settings import SETTINGS
+from acidwatch_api.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class AppState(TypedDict):
+    engine: AsyncEngine
+    session: SessionMaker
+    bulkheads: Bulkheads
+    process_pool: ProcessPool | None
+    result_cache: ResultCache | None
+    in_flight: SingleFlight[CacheEntry]
+    notifications: NotificationBus
+
+
+@asynccontextmanager
+async def open_state() -> AsyncIterator[AppState]:
+    async with open_database() as (engine, session):
+        process_pool: ProcessPool | None = None
+        if SETTINGS.acidwatch_process_pool_size > 0:
+            process_pool = ProcessPool(
+                SETTINGS.acidwatch_process_pool_size, preload=["acidwatch_api.models"]
+            )
+            process_pool.start()
+        else:
+            logger.warning(
+                "The process pool is disabled. CPU-bound models that time out "
+                "will keep running until they finish."
+            )
+
+        state: AppState = {
+            "engine": engine,
+            "session": session,
+            "bulkheads": Bulkheads(),
+            "process_pool": process_pool,
+            "result_cache": None,
+            "in_flight": SingleFlight(),
+            "notifications": NotificationBus(),
+        }
+        if SETTINGS.acidwatch_result_cache:
+            state["result_cache"] = ResultCache(
+                session,
+                MemoryCache(
+                    SETTINGS.acidwatch_result_cache_memory_bytes,
+                    SETTINGS.acidwatch_result_cache_ttl_seconds,
+                ),
+            )
+
+        try:
+            yield state
+        finally:
+            await HTTP_CLIENTS.aclose()
+            if process_pool is not None:
+                process_pool.close()
+
+
+def get_state(request: Request) -> AppState:
+    return cast(AppState, request.scope["state"])
+
+
+GetState: TypeAlias = Annotated[AppState, Depends(get_state)]
@@ -0,0 +1,107 @@
+"""Standalone simulation worker.
+
+Pulls jobs from the persistent queue and runs their model chains, so that
+simulations survive API restarts and compute can be scaled independently of
+the API. Run it with ``acidwatch-api-worker`` or ``python -m acidwatch_api.worker``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from acidwatch_api import jobs
+from acidwatch_api.state import AppState, open_state
+from acidwatch_api.routes.models import get_adapters, run_job
+
+logger = logging.getLogger(__name__)
+
+
+# Longest wait after repeated errors, eg. while the database is unavailable
+MAX_BACKOFF_SECONDS = 60.0
+
+
+async def work(
+    state: AppState, owner: str, poll_interval: float, orphaned_only: bool = False
+) -> None:
+    """Claim and run jobs one at a time until cancelled
+
+    Args:
+        orphaned_only: Only claim jobs that their API process has not run, eg.
+            because it was restarted. See ``jobs.claim_job``.
+
+    """
+    all_adapters = get_adapters()
+    backoff = poll_interval
+    while True:
+        try:
+            job = await jobs.claim_job(
+                state["session"], owner, orphaned_only=orphaned_only
+            )
+            backoff = poll_interval
+            if job is None:
+                await asyncio.sleep(poll_interval)
+                continue
+
+            logger.info("Running job %s (attempt %d)", job.id, job.attempts)
+            await run_job(state, job, owner, all_adapters)
+        except Exception:
+            logger.exception("Job loop failed, retrying in %.0f s", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+
+async def serve(concurrency: int, poll_interval: float) -> None:
+    """Run ``concurrency`` job loops until interrupted.
+
+    On SIGINT/SIGTERM, running jobs are cancelled and put back on the queue
+    so that another worker can resume them right away.
+    """
+    owner = jobs.worker_id()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with open_state() as state:
+        loops = [
+            asyncio.create_task(work(state, owner, poll_interval))
+            for _ in range(concurrency)
+        ]
+        logger.info("Worker %s started with %d job loops", owner, concurrency)
+        await stop.wait()
+
+        logger.info("Worker %s shutting down", owner)
+        for task in loops:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run AcidWatch simulation jobs")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="number of jobs to run at the same time",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="seconds to wait before polling an empty queue again",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.INFO,
+    )
+    asyncio.run(serve(args.concurrency, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ from uuid import UUID
 from sqlalchemy import create_engine, text
 
 
+@pytest.fixture(autouse=True)
+def no_process_pool(monkeypatch):
+    # Starting worker processes, and their JVMs, for every app is slow
+    monkeypatch.setattr(SETTINGS, "acidwatch_process_pool_size", 0)
+
+
 @pytest.fixture(scope="session")
 def set_acidwatch_env_to_test():
     from acidwatch_api.settings import SETTINGS
@@ -0,0 +1,66 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import text
+
+
+def _row(id, **values):
+    return {
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "id": id,
+        **values,
+    }
+
+
+def test_migration_numbers_finished_grid_points(alembic_runner, alembic_engine):
+    alembic_runner.migrate_up_before("2d6f8b1e5c37")
+
+    grid_id = UUID(int=500)
+    alembic_runner.insert_into(
+        "grid_simulations", _row(grid_id, owner_id=None, axes=[])
+    )
+    statuses = ["done", "pending", "error", "done"]
+    for position, status in enumerate(statuses):
+        simulation_id = UUID(int=grid_id.int + position + 1)
+        alembic_runner.insert_into(
+            "simulations",
+            _row(
+                simulation_id,
+                owner_id=None,
+                phases=[],
+                conditions={},
+                status=status,
+                completed_steps=1,
+                total_steps=1,
+            ),
+        )
+        alembic_runner.insert_into(
+            "grid_simulation_points",
+            _row(
+                UUID(int=grid_id.int + position + 11),
+                grid_simulation_id=grid_id,
+                simulation_id=simulation_id,
+                position=position,
+                coordinates=[],
+            ),
+        )
+
+    alembic_runner.migrate_up_one()
+
+    with alembic_engine.connect() as conn:
+        indices = conn.execute(
+            text(
+                "SELECT completion_index FROM grid_simulation_points "
+                "WHERE grid_simulation_id = :grid_id ORDER BY position"
+            ),
+            {"grid_id": grid_id},
+        ).scalars()
+        assert list(indices) == [1, None, 2, 3]
+        completed_points = conn.execute(
+            text("SELECT completed_points FROM grid_simulations WHERE id = :grid_id"),
+            {"grid_id": grid_id},
+        ).scalar()
+        assert completed_points == 3
+
+    alembic_runner.migrate_down_one()
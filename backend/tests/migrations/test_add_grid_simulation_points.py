@@ -0,0 +1,69 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import text
+
+
+def _simulation(id, concentrations):
+    return {
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "id": id,
+        "owner_id": None,
+        "phases": [
+            {"kind": "co2-rich", "fraction": 1.0, "concentrations": concentrations}
+        ],
+        "conditions": {},
+    }
+
+
+def test_migration_moves_grid_members_up_and_down(alembic_runner, alembic_engine):
+    alembic_runner.migrate_up_before("f3a9c2d71b58")
+
+    grid_id = UUID(int=300)
+    simulation_ids = [UUID(int=301), UUID(int=302)]
+    alembic_runner.insert_into(
+        "simulations", _simulation(simulation_ids[0], {"H2O": 10, "NO2": 5})
+    )
+    alembic_runner.insert_into(
+        "simulations", _simulation(simulation_ids[1], {"H2O": 20, "NO2": 5})
+    )
+    alembic_runner.insert_into(
+        "grid_simulations",
+        {
+            "created_at": datetime.now(),
+            "updated_at": datetime.now(),
+            "id": grid_id,
+            "owner_id": None,
+            "axes": [
+                {"substance": "NO2", "range": {"min": 5, "max": 5, "step": 1}},
+                {"substance": "H2O", "range": {"min": 10, "max": 20, "step": 10}},
+            ],
+            "simulation_ids": [str(id) for id in simulation_ids],
+        },
+    )
+
+    alembic_runner.migrate_up_one()
+
+    with alembic_engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT simulation_id, position, coordinates "
+                "FROM grid_simulation_points WHERE grid_simulation_id = :grid_id "
+                "ORDER BY position"
+            ),
+            {"grid_id": grid_id},
+        ).fetchall()
+        assert rows == [
+            (simulation_ids[0], 0, [5, 10]),
+            (simulation_ids[1], 1, [5, 20]),
+        ]
+
+    alembic_runner.migrate_down_one()
+
+    with alembic_engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT simulation_ids FROM grid_simulations WHERE id = :grid_id"),
+            {"grid_id": grid_id},
+        ).fetchone()
+        assert row == ([str(id) for id in simulation_ids],)
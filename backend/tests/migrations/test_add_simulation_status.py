@@ -0,0 +1,74 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import text
+
+
+def _row(id, **values):
+    return {
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "id": id,
+        **values,
+    }
+
+
+def _simulation(id):
+    return _row(id, owner_id=None, phases=[], conditions={})
+
+
+def _model_input(id, simulation_id, previous_model_input_id=None):
+    return _row(
+        id,
+        simulation_id=simulation_id,
+        previous_model_input_id=previous_model_input_id,
+        model_id="dummy",
+        parameters={},
+    )
+
+
+def _result(id, model_input_id, error=None):
+    return _row(id, model_input_id=model_input_id, phases=[], panels=[], error=error)
+
+
+def test_migration_backfills_simulation_status(alembic_runner, alembic_engine):
+    alembic_runner.migrate_up_before("c8d2f6a4e913")
+
+    done, pending, failed = UUID(int=400), UUID(int=410), UUID(int=420)
+    for simulation_id in (done, pending, failed):
+        alembic_runner.insert_into("simulations", _simulation(simulation_id))
+        first, second = UUID(int=simulation_id.int + 1), UUID(int=simulation_id.int + 2)
+        alembic_runner.insert_into("model_inputs", _model_input(first, simulation_id))
+        alembic_runner.insert_into(
+            "model_inputs", _model_input(second, simulation_id, first)
+        )
+        if simulation_id != pending:
+            alembic_runner.insert_into(
+                "results", _result(UUID(int=simulation_id.int + 3), first)
+            )
+        if simulation_id == done:
+            alembic_runner.insert_into(
+                "results", _result(UUID(int=simulation_id.int + 4), second)
+            )
+        if simulation_id == failed:
+            alembic_runner.insert_into(
+                "results", _result(UUID(int=simulation_id.int + 4), second, "Oops")
+            )
+
+    alembic_runner.migrate_up_one()
+
+    with alembic_engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT id, status, completed_steps, total_steps FROM simulations "
+                "WHERE id IN (:done, :pending, :failed) ORDER BY id"
+            ),
+            {"done": done, "pending": pending, "failed": failed},
+        ).fetchall()
+        assert rows == [
+            (done, "done", 2, 2),
+            (pending, "pending", 0, 2),
+            (failed, "error", 2, 2),
+        ]
+
+    alembic_runner.migrate_down_one()
@@ -3,6 +3,7 @@ from pydantic import Field
 from pydantic import PydanticUserError
 import pytest
 from acidwatch_api.models import base
+from acidwatch_api.models.datamodel import Phase
 
 
 def test_parameters_class_must_contain_only_parameter_fields():
@@ -74,3 +75,29 @@ def test_adapter_description_is_rendered_to_html_once():
     assert MarkdownAdapter.description_as_html() == (
         "<h1>Title</h1>\n<p>Some <strong>markdown</strong> body.</p>"
     )
+
+
+async def test_default_run_batch_runs_each_composition():
+    class DoublingAdapter(base.BaseAdapter):
+        model_id = "doubling"
+        valid_substances = ["H2O"]
+
+        async def run(self):
+            if self.concentrations["H2O"] < 0:
+                raise ValueError("Negative")
+            return [
+                Phase(
+                    kind="co2-rich",
+                    fraction=1.0,
+                    concentrations={"H2O": self.concentrations["H2O"] * 2},
+                )
+            ]
+
+    adapter = DoublingAdapter(parameters=None, jwt_token=None)
+    first, second, third = await adapter.run_batch(
+        [{"H2O": 1}, {"H2O": -1}, {"H2O": 3}]
+    )
+
+    assert first[0].concentrations == {"H2O": 2}
+    assert isinstance(second, ValueError)
+    assert third[0].concentrations == {"H2O": 6}
@@ -1,6 +1,7 @@
 from acidwatch_api.models.gibbs_minimization_model import (
     GibbsMinimizationModelAdapter,
     _EquationOfState,
+    _system_template,
     NOT_INITIALIZED_BY_DEFAULT,
     INITIALIZED_BY_DEFAULT,
 )
@@ -22,6 +23,13 @@ class MockStream(MagicMock):
         return MockFluid()
 
 
+@pytest.fixture(autouse=True)
+def clear_system_templates():
+    _system_template.cache_clear()
+    yield
+    _system_template.cache_clear()
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "concentrations",
@@ -74,12 +82,37 @@ async def test_only_allowed_components_are_added_by_default(
         name = GibbsMinimizationModelAdapter.formula_to_neqsim.get(comp, comp)
         assert name not in added, f"{name} should not be added, but was still found"
 
-    arglist = [x.args for x in mocked_system.addComponent.call_args_list]
+    # Amounts are set on a clone of the initialized system
+    (flow_rates,) = mocked_system.clone.return_value.setMolarFlowRates.call_args.args
+    amounts = dict(zip(added, flow_rates))
     for comp, value in concentrations.items():
         name = GibbsMinimizationModelAdapter.formula_to_neqsim.get(comp, comp)
-        assert (name, value, "mole/sec") in arglist, (
-            f"Did not find {name} to be added to the arglist: {arglist}"
+        assert amounts.get(name) == value, (
+            f"Did not find {name} to be added with {value}: {amounts}"
+        )
+
+
+async def test_system_is_reused_for_same_components(monkeypatch):
+    created = MagicMock()
+    monkeypatch.setattr(jneqsim.thermo.system, "SystemSrkEos", created)
+    monkeypatch.setattr(
+        jneqsim.process.equipment.stream, "Stream", lambda *args: MockStream()
+    )
+    monkeypatch.setattr(jneqsim.process.equipment.reactor, "GibbsReactor", MagicMock())
+
+    for water in (1.0, 2.0):
+        adapter = GibbsMinimizationModelAdapter(
+            concentrations={"H2O": water},
+            parameters={},
+            conditions=Conditions(temperature=water, pressure=10),
+            jwt_token=None,
         )
+        await adapter.run()
+
+    assert created.call_count == 1
+    template = created.return_value
+    assert template.clone.call_count == 2
+    assert template.clone.return_value.setTemperature.call_args.args == (275.0,)
 
 
 def test_no_overlapping_substances():
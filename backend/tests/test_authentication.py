@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from acidwatch_api import authentication
+from acidwatch_api.authentication import (
+    TOKEN_REFRESH_MARGIN_SECONDS,
+    OnBehalfOfAuth,
+    OnBehalfOfTokens,
+)
+
+
+class FakeApp:
+    def __init__(self, expires_in=3600, error=None, delay=0.0):
+        self.calls = []
+        self.expires_in = expires_in
+        self.error = error
+        self.delay = delay
+        self.threads = set()
+
+    def acquire_token_on_behalf_of(self, user_assertion, scopes):
+        self.calls.append((user_assertion, scopes))
+        self.threads.add(threading.get_ident())
+        if self.delay:
+            threading.Event().wait(self.delay)
+        if self.error:
+            return {"error": self.error, "error_description": f"{self.error}!"}
+        return {
+            "access_token": f"{user_assertion}:{scopes[0]}:{len(self.calls)}",
+            "expires_in": self.expires_in,
+        }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(authentication.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def test_token_is_cached_per_user_and_scope():
+    app = FakeApp()
+    tokens = OnBehalfOfTokens(app)
+
+    first = await tokens.acquire("scope-a", "alice")
+    assert await tokens.acquire("scope-a", "alice") == first
+    assert (await tokens.acquire("scope-b", "alice"))["access_token"] != (
+        first["access_token"]
+    )
+    assert (await tokens.acquire("scope-a", "bob"))["access_token"] != (
+        first["access_token"]
+    )
+    assert len(app.calls) == 3
+
+
+async def test_token_is_acquired_off_the_event_loop():
+    app = FakeApp()
+    await OnBehalfOfTokens(app).acquire("scope", "alice")
+    assert threading.get_ident() not in app.threads
+
+
+async def test_token_is_refreshed_ahead_of_expiry(clock):
+    app = FakeApp(expires_in=TOKEN_REFRESH_MARGIN_SECONDS + 60)
+    tokens = OnBehalfOfTokens(app)
+
+    first = await tokens.acquire("scope", "alice")
+    clock[0] += 59
+    assert await tokens.acquire("scope", "alice") == first
+
+    clock[0] += 1
+    assert await tokens.acquire("scope", "alice") != first
+    assert len(app.calls) == 2
+
+
+async def test_errors_are_not_cached():
+    app = FakeApp(error="invalid_grant")
+    tokens = OnBehalfOfTokens(app)
+
+    assert (await tokens.acquire("scope", "alice"))["error"] == "invalid_grant"
+    await tokens.acquire("scope", "alice")
+    assert len(app.calls) == 2
+
+
+async def test_concurrent_requests_share_one_acquisition():
+    app = FakeApp(delay=0.05)
+    tokens = OnBehalfOfTokens(app)
+
+    results = await asyncio.gather(
+        *(tokens.acquire("scope", "alice") for _ in range(10))
+    )
+    assert len(app.calls) == 1
+    assert all(result == results[0] for result in results)
+
+
+async def test_auth_adds_on_behalf_of_token(monkeypatch):
+    monkeypatch.setattr(authentication, "obo_tokens", OnBehalfOfTokens(FakeApp()))
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(200)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await client.get("http://remote.invalid", auth=OnBehalfOfAuth("s", "alice"))
+
+    assert seen == ["Bearer alice:s:1"]
+
+
+async def test_auth_error_is_unauthorized(monkeypatch):
+    monkeypatch.setattr(
+        authentication, "obo_tokens", OnBehalfOfTokens(FakeApp(error="invalid_grant"))
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        await authentication.acquire_token_for_downstream_api("s", "alice")
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "invalid_grant!"
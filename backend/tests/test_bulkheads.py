@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from acidwatch_api.bulkheads import Bulkhead, BulkheadFull
+
+
+async def test_bulkhead_limits_concurrency():
+    bulkhead = Bulkhead("dummy", max_concurrency=2, max_queue=None)
+    running = 0
+    max_running = 0
+
+    async def run():
+        nonlocal running, max_running
+        async with bulkhead.slot():
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(run() for _ in range(10)))
+    assert max_running == 2
+
+
+async def test_bulkhead_rejects_runs_when_queue_is_full():
+    bulkhead = Bulkhead("dummy", max_concurrency=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def run():
+        async with bulkhead.slot():
+            await release.wait()
+
+    first = asyncio.create_task(run())
+    second = asyncio.create_task(run())
+    await asyncio.sleep(0)
+    assert bulkhead.waiting == 1
+
+    with pytest.raises(BulkheadFull, match="'dummy' is at capacity"):
+        async with bulkhead.slot():
+            pass
+
+    release.set()
+    await asyncio.gather(first, second)
@@ -1,12 +1,22 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from uuid import UUID, uuid4
+
 import pytest
 from fastapi.testclient import TestClient as _BaseTestClient
+from sqlalchemy import event, select
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
+import acidwatch_api.database as db
 from acidwatch_api.app import fastapi_app
 from acidwatch_api.authentication import authenticated_user_claims
 from acidwatch_api.models import base
-from acidwatch_api.models.datamodel import Phase
-from acidwatch_api.routes.models import get_adapters
+from acidwatch_api.models.datamodel import Phase, TextResult
+from acidwatch_api.routes.models import get_adapters, run_grid_jobs
+from acidwatch_api.routes import grid_simulations
+from acidwatch_api.routes.grid_simulations import COLUMNAR_MEDIA_TYPE
+from acidwatch_api.settings import SETTINGS
 
 
 class TestClient(_BaseTestClient):
@@ -99,6 +109,61 @@ class TwoSubstanceAdapter(base.BaseAdapter):
         ]
 
 
+class SlowAdapter(base.BaseAdapter):
+    model_id = "slow"
+    display_name = "Slow Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+
+    running = 0
+    max_running = 0
+
+    async def run(self):
+        cls = type(self)
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        await asyncio.sleep(0.01)
+        cls.running -= 1
+        return [
+            Phase(kind="co2-rich", fraction=1.0, concentrations=self.concentrations)
+        ]
+
+
+class PickyAdapter(base.BaseAdapter):
+    model_id = "picky"
+    display_name = "Picky Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+
+    async def run(self):
+        if self.concentrations["H2O"] == 30:
+            raise ValueError("Unlucky composition")
+        return [
+            Phase(kind="co2-rich", fraction=1.0, concentrations=self.concentrations)
+        ]
+
+
+class BatchingAdapter(base.BaseAdapter):
+    model_id = "batching"
+    display_name = "Batching Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+
+    batches: list[int] = []
+
+    async def run_batch(self, concentrations):
+        type(self).batches.append(len(concentrations))
+        return [
+            ValueError("Unlucky composition")
+            if value["H2O"] == 30
+            else [Phase(kind="co2-rich", fraction=1.0, concentrations=value)]
+            for value in concentrations
+        ]
+
+
 @pytest.fixture
 def dummy_adapters(client):
     client.app.dependency_overrides[get_adapters] = lambda: {
@@ -138,6 +203,298 @@ def test_grid_produces_correct_number_of_points(client):
         assert sim["status"] == "done"
 
 
+@contextmanager
+def _record_statements(client, kind):
+    """Record the table of each statement of the given kind"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(kind):
+            statements.append(statement)
+
+    engine = client.app_state["engine"].sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_creation_inserts_points_in_bulk(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+
+    with _record_statements(client, "INSERT") as statements:
+        _create_grid(
+            client,
+            models=[
+                {"modelId": "halving", "parameters": {}},
+                {"modelId": "quadrupling", "parameters": {}},
+            ],
+        ).raise_for_status()
+
+    assert [statement.split()[2] for statement in statements] == [
+        "grid_simulations",
+        "simulations",
+        "model_inputs",
+        "simulation_jobs",
+        "grid_simulation_points",
+    ]
+
+
+@pytest.mark.parametrize("step", [50, 10])
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_result_query_count_is_independent_of_size(client, step):
+    grid_id = _create_grid(
+        client,
+        axes=[{"substance": "H2O", "range": {"min": 10, "max": 100, "step": step}}],
+    ).json()
+
+    with _record_statements(client, "SELECT") as statements:
+        result = client.get_json(f"/grid-simulations/{grid_id}/result")
+
+    assert len(result["simulations"]) == 90 // step + 1
+    assert len(statements) == 4
+
+
+async def _grid_job_ids(state, grid_id):
+    async with state["session"]() as session:
+        return list(
+            await session.scalars(
+                select(db.SimulationJob.id)
+                .join(
+                    db.GridSimulationPoint,
+                    db.GridSimulationPoint.simulation_id
+                    == db.SimulationJob.simulation_id,
+                )
+                .where(db.GridSimulationPoint.grid_simulation_id == grid_id)
+                .order_by(db.GridSimulationPoint.position)
+            )
+        )
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+async def test_grid_updates_contain_points_finished_after_cursor(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    grid_id = UUID(
+        _create_grid(
+            client,
+            axes=[{"substance": "H2O", "range": {"min": 10, "max": 40, "step": 10}}],
+        ).json()
+    )
+    path = f"/grid-simulations/{grid_id}/result"
+
+    assert client.get_json(path)["cursor"] == 0
+    assert client.get_json(path, params={"since": 0})["points"] == []
+
+    state = client.app_state
+    job_ids = await _grid_job_ids(state, grid_id)
+    adapters = {HalvingAdapter.model_id: HalvingAdapter}
+
+    await run_grid_jobs(state, job_ids[2:], adapters)
+    update = client.get_json(path, params={"since": 0})
+    assert [point["position"] for point in update["points"]] == [2, 3]
+    assert update["points"][0]["simulation"]["results"][0]["phases"][0][
+        "concentrations"
+    ] == {"H2O": 15}
+    assert {key: update[key] for key in update if key != "points"} == {
+        "status": "pending",
+        "completedSteps": 2,
+        "totalSteps": 4,
+        "cursor": 2,
+    }
+
+    await run_grid_jobs(state, job_ids[:2], adapters)
+    update = client.get_json(path, params={"since": update["cursor"]})
+    assert [point["position"] for point in update["points"]] == [0, 1]
+    assert update["status"] == "done"
+    assert update["cursor"] == 4
+
+    assert client.get_json(path, params={"since": 4})["points"] == []
+    result = client.get_json(path)
+    assert result["cursor"] == 4
+    assert update["points"][1]["simulation"] == result["simulations"][1]
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+async def test_done_grid_update_has_final_cursor(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    grid_id = UUID(_create_grid(client).json())
+    state = client.app_state
+    job_ids = await _grid_job_ids(state, grid_id)
+    query_grid_status = grid_simulations._query_grid_status
+
+    async def finish_grid_then_query_status(session, grid_id):
+        # All points finish while the update is being read
+        await run_grid_jobs(state, job_ids, {HalvingAdapter.model_id: HalvingAdapter})
+        return await query_grid_status(session, grid_id)
+
+    monkeypatch.setattr(
+        grid_simulations, "_query_grid_status", finish_grid_then_query_status
+    )
+    update = client.get_json(f"/grid-simulations/{grid_id}/result", params={"since": 0})
+
+    assert update["status"] == "done"
+    assert update["cursor"] == 10
+    assert len(update["points"]) == 10
+
+
+def test_grid_update_of_unknown_grid(client):
+    response = client.get(f"/grid-simulations/{uuid4()}/result", params={"since": 0})
+    assert response.status_code == 404
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_status_counts_steps_of_all_points(client, monkeypatch):
+    models = [
+        {"modelId": "halving", "parameters": {}},
+        {"modelId": "quadrupling", "parameters": {}},
+    ]
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    queued = _create_grid(client, models=models).json()
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", True)
+    finished = _create_grid(client, models=models).json()
+
+    assert client.get_json(f"/grid-simulations/{queued}/status") == {
+        "status": "pending",
+        "completedSteps": 0,
+        "totalSteps": 20,
+    }
+    assert client.get_json(f"/grid-simulations/{finished}/status") == {
+        "status": "done",
+        "completedSteps": 20,
+        "totalSteps": 20,
+    }
+
+
+def _read_events(client, path):
+    with client.stream("GET", path) as response:
+        response.raise_for_status()
+        text = response.read().decode()
+
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1)
+            for line in block.splitlines()
+            if not line.startswith(":")
+        )
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_events_stream_every_step_and_end_with_status(client):
+    grid_id = _create_grid(
+        client,
+        axes=[{"substance": "H2O", "range": {"min": 5, "max": 10, "step": 5}}],
+        models=[
+            {"modelId": "halving", "parameters": {}},
+            {"modelId": "quadrupling", "parameters": {}},
+        ],
+    ).json()
+
+    events = _read_events(client, f"/grid-simulations/{grid_id}/events")
+
+    assert [(data["position"], data["step"]) for event, data in events[:-1]] == [
+        (0, 0),
+        (0, 1),
+        (1, 0),
+        (1, 1),
+    ]
+    assert events[1][1]["result"]["phases"][0]["concentrations"] == {"H2O": 10}
+    assert events[-1] == (
+        "status",
+        {"status": "done", "completedSteps": 4, "totalSteps": 4},
+    )
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+async def test_grid_events_include_points_finished_while_streaming(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    grid_id = UUID(_create_grid(client).json())
+    state = client.app_state
+    job_ids = await _grid_job_ids(state, grid_id)
+    query_grid_status = grid_simulations._query_grid_status
+
+    async def finish_grid_then_query_status(session, grid_id):
+        # All points finish while the stream is reading the grid
+        if job_ids:
+            await run_grid_jobs(
+                state, job_ids, {HalvingAdapter.model_id: HalvingAdapter}
+            )
+            job_ids.clear()
+        return await query_grid_status(session, grid_id)
+
+    monkeypatch.setattr(
+        grid_simulations, "_query_grid_status", finish_grid_then_query_status
+    )
+    events = _read_events(client, f"/grid-simulations/{grid_id}/events")
+
+    assert sorted(data["position"] for event, data in events[:-1]) == list(range(10))
+    assert events[-1] == (
+        "status",
+        {"status": "done", "completedSteps": 10, "totalSteps": 10},
+    )
+
+
+async def test_grid_events_end_each_point_at_its_error(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    adapters = {
+        PickyAdapter.model_id: PickyAdapter,
+        HalvingAdapter.model_id: HalvingAdapter,
+    }
+    client.app.dependency_overrides[get_adapters] = lambda: adapters
+    grid_id = UUID(
+        _create_grid(
+            client,
+            axes=[{"substance": "H2O", "range": {"min": 20, "max": 40, "step": 10}}],
+            models=[
+                {"modelId": "picky", "parameters": {}},
+                {"modelId": "halving", "parameters": {}},
+            ],
+        ).json()
+    )
+    state = client.app_state
+    points = await grid_simulations._get_grid_points(grid_id, state)
+
+    async def listen():
+        return [
+            (event.event, json.loads(event.raw_data))
+            async for event in grid_simulations.stream_grid_simulation_events(
+                grid_id, state, points
+            )
+        ]
+
+    listener = asyncio.create_task(listen())
+    while not len(state["notifications"]):
+        await asyncio.sleep(0.01)
+    await run_grid_jobs(state, await _grid_job_ids(state, grid_id), adapters)
+    events = await asyncio.wait_for(listener, 5)
+
+    results = [data for event, data in events if event == "result"]
+    # The failed point's chain ends at its error
+    assert sorted((data["position"], data["step"]) for data in results) == [
+        (0, 0),
+        (0, 1),
+        (1, 0),
+        (2, 0),
+        (2, 1),
+    ]
+    (error,) = [data["error"] for data in results if data["position"] == 1]
+    assert error == "ValueError: Unlucky composition"
+    assert events[-1] == (
+        "status",
+        {"status": "done", "completedSteps": 5, "totalSteps": 6},
+    )
+
+
+def test_events_of_unknown_grid(client):
+    response = client.get(f"/grid-simulations/{uuid4()}/events")
+    assert response.status_code == 404
+
+
 @pytest.mark.usefixtures("dummy_adapters")
 def test_grid_points_are_individually_retrievable_simulations(client):
     grid_id = _create_grid(
@@ -259,3 +616,162 @@ def test_grid_rejects_duplicate_axis_substances(client):
         ],
     )
     assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_points_run_concurrently_up_to_limit(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_grid_concurrency", 3)
+    monkeypatch.setattr(SlowAdapter, "max_running", 0)
+    client.app.dependency_overrides[get_adapters] = lambda: {
+        SlowAdapter.model_id: SlowAdapter,
+    }
+
+    grid_id = _create_grid(
+        client, models=[{"modelId": "slow", "parameters": {}}]
+    ).json()
+    result = client.get_json(f"/grid-simulations/{grid_id}/result")
+
+    assert result["status"] == "done"
+    assert SlowAdapter.max_running == 3
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_points_respect_adapter_concurrency_limit(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_grid_concurrency", 8)
+    monkeypatch.setattr(SlowAdapter, "max_running", 0)
+    monkeypatch.setattr(SlowAdapter, "max_concurrency", 2)
+    client.app.dependency_overrides[get_adapters] = lambda: {
+        SlowAdapter.model_id: SlowAdapter,
+    }
+
+    grid_id = _create_grid(
+        client, models=[{"modelId": "slow", "parameters": {}}]
+    ).json()
+    result = client.get_json(f"/grid-simulations/{grid_id}/result")
+
+    assert result["status"] == "done"
+    assert SlowAdapter.max_running == 2
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_runs_batching_adapter_once_per_step(client, monkeypatch):
+    monkeypatch.setattr(BatchingAdapter, "batches", [])
+    client.app.dependency_overrides[get_adapters] = lambda: {
+        BatchingAdapter.model_id: BatchingAdapter,
+        HalvingAdapter.model_id: HalvingAdapter,
+    }
+
+    grid_id = _create_grid(
+        client,
+        models=[
+            {"modelId": "batching", "parameters": {}},
+            {"modelId": "halving", "parameters": {}},
+        ],
+    ).json()
+    result = client.get_json(f"/grid-simulations/{grid_id}/result")
+
+    assert BatchingAdapter.batches == [10]
+    for sim in result["simulations"]:
+        (water,) = sim["input"]["concentrations"].values()
+        if water == 30:
+            assert sim["status"] == "error"
+            assert sim["error"] == "ValueError: Unlucky composition"
+        else:
+            assert sim["status"] == "done"
+            final = sim["results"][-1]["phases"][0]["concentrations"]
+            assert final == {"H2O": water / 2}
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_grid_results_can_describe_panels(client, monkeypatch):
+    async def run(self):
+        return [
+            Phase(kind="co2-rich", fraction=1.0, concentrations=self.concentrations)
+        ], TextResult(label="log", data="x" * 1000)
+
+    monkeypatch.setattr(PickyAdapter, "run", run)
+    client.app.dependency_overrides[get_adapters] = lambda: {
+        PickyAdapter.model_id: PickyAdapter
+    }
+    grid_id = _create_grid(
+        client,
+        axes=[{"substance": "H2O", "range": {"min": 10, "max": 20, "step": 10}}],
+        models=[{"modelId": "picky", "parameters": {}}],
+    ).json()
+    path = f"/grid-simulations/{grid_id}/result"
+    panel = client.get_json(path)["simulations"][0]["results"][0]["panels"][0]
+    size = len(json.dumps(panel, separators=(",", ":")))
+    descriptor = {"type": "text", "label": "log", "size": size}
+    descriptors = {"panels": "descriptors"}
+
+    result = client.get_json(path, params=descriptors)
+    update = client.get_json(path, params={**descriptors, "since": 0})
+    events = _read_events(
+        client, f"/grid-simulations/{grid_id}/events?panels=descriptors"
+    )
+
+    for simulation in result["simulations"]:
+        assert simulation["results"][0]["panels"] == [descriptor]
+    for point in update["points"]:
+        assert point["simulation"]["results"][0]["panels"] == [descriptor]
+    for _, data in events[:-1]:
+        assert data["result"]["panels"] == [descriptor]
+
+
+def test_columnar_grid_result_matches_nested_result(client, monkeypatch):
+    monkeypatch.setattr(BatchingAdapter, "batches", [])
+    monkeypatch.setattr(BatchingAdapter, "valid_substances", ["H2O", "NO2", "SO2"])
+    client.app.dependency_overrides[get_adapters] = lambda: {
+        BatchingAdapter.model_id: BatchingAdapter,
+        HalvingAdapter.model_id: HalvingAdapter,
+    }
+    grid_id = _create_grid(
+        client,
+        axes=[
+            {"substance": "H2O", "range": {"min": 10, "max": 40, "step": 10}},
+            {"substance": "NO2", "range": {"min": 1, "max": 2, "step": 1}},
+        ],
+        concentrations={"SO2": 5},
+        models=[
+            {"modelId": "batching", "parameters": {}},
+            {"modelId": "halving", "parameters": {}},
+        ],
+    ).json()
+    path = f"/grid-simulations/{grid_id}/result"
+
+    nested = client.get(path)
+    response = client.get(path, params={"format": "columnar"})
+    assert response.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    columnar = response.json()
+
+    assert client.get_json(path, headers={"Accept": COLUMNAR_MEDIA_TYPE}) == columnar
+    assert len(response.content) < len(nested.content) / 2
+
+    assert columnar["coordinates"] == [
+        [10, 10, 20, 20, 30, 30, 40, 40],
+        [1, 2, 1, 2, 1, 2, 1, 2],
+    ]
+    assert columnar["concentrations"] == {"SO2": 5}
+    assert [model["modelId"] for model in columnar["models"]] == ["batching", "halving"]
+    assert columnar["statuses"] == ["done"] * 4 + ["error"] * 2 + ["done"] * 2
+    assert columnar["errors"][4] == "ValueError: Unlucky composition"
+
+    (phase,) = columnar["steps"][1]["phases"]
+    for index, simulation in enumerate(nested.json()["simulations"]):
+        if simulation["status"] == "error":
+            assert phase["concentrations"]["H2O"][index] is None
+            continue
+        (expected,) = simulation["results"][1]["phases"]
+        assert phase["fraction"][index] == expected["fraction"]
+        for substance, value in expected["concentrations"].items():
+            assert phase["concentrations"][substance][index] == value
+
+
+@pytest.mark.usefixtures("dummy_adapters")
+def test_columnar_grid_result_does_not_support_since(client):
+    grid_id = _create_grid(client).json()
+    response = client.get(
+        f"/grid-simulations/{grid_id}/result",
+        params={"format": "columnar", "since": 0},
+    )
+    assert response.status_code == 422
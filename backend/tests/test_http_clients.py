@@ -0,0 +1,61 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from acidwatch_api.app import fastapi_app
+from acidwatch_api.http_clients import (
+    HTTP_CLIENTS,
+    HttpClients,
+    ModelClient,
+)
+from acidwatch_api.models import base
+
+
+class RemoteAdapter(base.BaseAdapter):
+    model_id = "remote"
+    display_name = "Remote Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+    base_url = "http://remote.invalid"
+
+
+async def test_clients_are_shared_per_base_url():
+    clients = HttpClients()
+
+    first = clients.get("http://a.invalid")
+    assert clients.get("http://a.invalid") is first
+    assert clients.get("http://b.invalid") is not first
+
+    await clients.aclose()
+    assert first.is_closed
+    assert len(clients) == 0
+    assert clients.get("http://a.invalid") is not first
+    await clients.aclose()
+
+
+async def test_auth_is_added_per_request():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("Authorization"))
+        return httpx.Response(200)
+
+    async with httpx.AsyncClient(
+        base_url="http://remote.invalid", transport=httpx.MockTransport(handler)
+    ) as shared:
+        await ModelClient(shared, httpx.BasicAuth("alice", "")).post("/run")
+        await ModelClient(shared, httpx.BasicAuth("bob", "")).post("/run")
+        await ModelClient(shared, None).get("/health")
+
+    assert seen == ["Basic YWxpY2U6", "Basic Ym9iOg==", None]
+    assert "Authorization" not in shared.headers
+
+
+def test_adapters_share_the_client_until_shutdown():
+    with TestClient(fastapi_app):
+        first = RemoteAdapter(parameters=None, jwt_token=None).client
+        second = RemoteAdapter(parameters=None, jwt_token=None).client
+        assert first._client is second._client
+
+    assert first._client.is_closed
+    assert len(HTTP_CLIENTS) == 0
@@ -0,0 +1,471 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi.testclient import TestClient as _BaseTestClient
+from sqlalchemy import select, update
+
+import acidwatch_api.database as db
+from acidwatch_api import jobs, worker
+from acidwatch_api.app import fastapi_app
+from acidwatch_api.authentication import User, get_optional_current_user
+from acidwatch_api.models import base
+from acidwatch_api.models.datamodel import Phase
+from acidwatch_api.routes import models as models_route
+from acidwatch_api.routes.models import (
+    get_adapters,
+    run_job,
+    stream_simulation_events,
+)
+from acidwatch_api.settings import SETTINGS
+
+
+class TestClient(_BaseTestClient):
+    def get_json(self, *args, **kwargs):
+        response = self.get(*args, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+
+@pytest.fixture
+def client():
+    with TestClient(fastapi_app) as c:
+        yield c
+
+
+@pytest.fixture
+def sessionmaker(client):
+    return client.app_state["session"]
+
+
+class CountingAdapter(base.BaseAdapter):
+    model_id = "counting"
+    display_name = "Counting Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+
+    runs = 0
+    jwt_tokens: list[str | None] = []
+
+    async def run(self):
+        type(self).runs += 1
+        type(self).jwt_tokens.append(self.jwt_token)
+        return [
+            Phase(
+                kind="co2-rich",
+                fraction=1.0,
+                concentrations={
+                    key: value + 1 for key, value in self.concentrations.items()
+                },
+            )
+        ]
+
+
+ADAPTERS = {CountingAdapter.model_id: CountingAdapter}
+
+
+@pytest.fixture
+def counting_adapter(client, monkeypatch):
+    monkeypatch.setattr(CountingAdapter, "runs", 0)
+    monkeypatch.setattr(CountingAdapter, "jwt_tokens", [])
+    client.app.dependency_overrides[get_adapters] = lambda: ADAPTERS
+    yield CountingAdapter
+    del client.app.dependency_overrides[get_adapters]
+
+
+@pytest.fixture
+def external_worker(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+
+
+def _submit(client, models=1, water=1):
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": water},
+            "models": [{"modelId": "counting", "parameters": {}}] * models,
+        },
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _job_status(sessionmaker, status):
+    """Wait until all jobs have the given status"""
+    while True:
+        async with sessionmaker() as session:
+            statuses = set(await session.scalars(select(db.SimulationJob.status)))
+        if statuses == {status}:
+            return
+        await asyncio.sleep(0.01)
+
+
+@asynccontextmanager
+async def _job_loop(client, monkeypatch):
+    """Run a worker's job loop, and stop it between queries
+
+    Cancelling the loop in the middle of a query would close the in-memory
+    database, so it is parked before claiming another job instead.
+    """
+    claim_job = jobs.claim_job
+    stopping = asyncio.Event()
+    parked = asyncio.Event()
+
+    async def claim_until_stopping(*args, **kwargs):
+        if stopping.is_set():
+            parked.set()
+            await asyncio.Event().wait()
+        return await claim_job(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "claim_job", claim_until_stopping)
+    monkeypatch.setattr(worker, "get_adapters", lambda: ADAPTERS)
+    loop = asyncio.create_task(worker.work(client.app_state, "worker-1", 0.01))
+    try:
+        yield loop
+    finally:
+        stopping.set()
+        await asyncio.wait_for(parked.wait(), 5)
+        loop.cancel()
+        await asyncio.gather(loop, return_exceptions=True)
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_simulation_stays_queued_without_inline_worker(client):
+    simulation_id = _submit(client)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "pending"
+    assert client.get_json(f"/simulations/{simulation_id}/status") == {
+        "status": "pending",
+        "completedSteps": 0,
+        "totalSteps": 1,
+    }
+    assert CountingAdapter.runs == 0
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_worker_runs_queued_simulation(client, sessionmaker):
+    simulation_id = _submit(client, models=2)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(client.app_state, job, "worker-1", ADAPTERS)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "done"
+    assert [r["phases"][0]["concentrations"] for r in result["results"]] == [
+        {"H2O": 2},
+        {"H2O": 3},
+    ]
+
+    async with sessionmaker() as session:
+        job = await session.get_one(db.SimulationJob, job.id)
+        assert job.status == "done"
+        assert job.lease_owner is None
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_progress_is_pushed_to_event_streams(client, sessionmaker, monkeypatch):
+    # Only notifications, and not polling, may wake up the stream
+    monkeypatch.setattr(SETTINGS, "acidwatch_events_poll_seconds", 60)
+    simulation_id = UUID(_submit(client, models=2))
+    state = client.app_state
+
+    async def listen():
+        return [
+            (event.event, event.raw_data)
+            async for event in stream_simulation_events(simulation_id, state)
+        ]
+
+    listener = asyncio.create_task(listen())
+    while not len(state["notifications"]):
+        await asyncio.sleep(0.01)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(state, job, "worker-1", ADAPTERS)
+
+    events = await asyncio.wait_for(listener, 5)
+    assert [event for event, _ in events] == [
+        "status",
+        "result",
+        "status",
+        "result",
+        "status",
+    ]
+    assert '"completedSteps":0' in events[0][1]
+    assert '"step":1' in events[3][1]
+    assert '"status":"done"' in events[4][1]
+    assert not len(state["notifications"])
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_unexpected_error_ends_simulation(client, sessionmaker, monkeypatch):
+    async def run_adapters(*args, **kwargs):
+        raise RuntimeError("Unexpected")
+
+    monkeypatch.setattr(models_route, "run_adapters", run_adapters)
+    simulation_id = _submit(client, models=2)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(client.app_state, job, "worker-1", ADAPTERS)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "error"
+    assert "internal error" in result["error"]
+    assert client.get_json(f"/simulations/{simulation_id}/status")["status"] == "error"
+    async with sessionmaker() as session:
+        assert (await session.get_one(db.SimulationJob, job.id)).status == "failed"
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_job_loop_survives_errors(client, sessionmaker, monkeypatch):
+    claim_job = jobs.claim_job
+    calls = 0
+
+    async def flaky_claim_job(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("Database unavailable")
+        return await claim_job(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "claim_job", flaky_claim_job)
+    simulation_id = _submit(client)
+
+    async with _job_loop(client, monkeypatch):
+        await asyncio.wait_for(_job_status(sessionmaker, "done"), 5)
+    assert calls >= 2
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "done"
+
+
+async def test_restarted_api_resumes_orphaned_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_database", f"sqlite:///{tmp_path}/db")
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    monkeypatch.setattr(SETTINGS, "acidwatch_job_poll_seconds", 0.01)
+    monkeypatch.setattr(worker, "get_adapters", lambda: ADAPTERS)
+    monkeypatch.setitem(
+        fastapi_app.dependency_overrides, get_adapters, lambda: ADAPTERS
+    )
+
+    # The API stops with one job still queued, and one whose worker died
+    with TestClient(fastapi_app) as client:
+        simulation_ids = [_submit(client), _submit(client)]
+        sessionmaker = client.app_state["session"]
+        assert await jobs.claim_job(sessionmaker, "dead-worker") is not None
+        async with db.begin_session(sessionmaker) as session:
+            for job in await session.scalars(select(db.SimulationJob)):
+                job.created_at -= timedelta(hours=1)
+                if job.status == "running":
+                    job.lease_expires_at = datetime.now() - timedelta(seconds=1)
+
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", True)
+    with TestClient(fastapi_app) as client:
+        await asyncio.wait_for(_job_status(client.app_state["session"], "done"), 5)
+        for simulation_id in simulation_ids:
+            result = client.get_json(f"/simulations/{simulation_id}/result")
+            assert result["status"] == "done"
+
+
+@pytest.mark.usefixtures("external_worker")
+async def test_inline_worker_leaves_new_jobs_to_their_requests(client, sessionmaker):
+    async with db.begin_session(sessionmaker) as session:
+        simulation = db.Simulation(phases=[], total_steps=0)
+        session.add(simulation)
+        await session.flush()
+        job = jobs.new_job(simulation.id)
+        session.add(job)
+
+    assert await jobs.claim_job(sessionmaker, "worker-1", orphaned_only=True) is None
+    assert await jobs.claim_job(sessionmaker, "worker-1") is not None
+
+
+@pytest.mark.usefixtures("counting_adapter")
+async def test_user_token_is_not_stored_with_job(client, sessionmaker, monkeypatch):
+    monkeypatch.setitem(
+        client.app.dependency_overrides,
+        get_optional_current_user,
+        lambda: User(id=str(uuid4()), name="", principal_name="", jwt_token="token"),
+    )
+    # The request that enqueues the job runs it with the user's token
+    _submit(client)
+    assert CountingAdapter.jwt_tokens == ["token"]
+
+    # Resumed jobs run without it
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    # The first step is served from the result cache
+    _submit(client, models=2)
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(client.app_state, job, "worker-1", ADAPTERS)
+    assert CountingAdapter.jwt_tokens == ["token", None]
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_resumed_job_asks_to_resubmit_signed_in_models(
+    client, sessionmaker, monkeypatch
+):
+    monkeypatch.setattr(CountingAdapter, "scope", "api://counting/.default")
+    simulation_id = _submit(client)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(client.app_state, job, "worker-1", ADAPTERS)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "error"
+    assert "submit the simulation again" in result["error"]
+    assert CountingAdapter.runs == 0
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_job_can_only_be_claimed_once(client, sessionmaker):
+    _submit(client)
+
+    assert await jobs.claim_job(sessionmaker, "worker-1") is not None
+    assert await jobs.claim_job(sessionmaker, "worker-2") is None
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_expired_lease_is_reclaimed_and_resumed(client, sessionmaker):
+    simulation_id = _submit(client, models=2)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+
+    # Pretend that worker-1 finished the first step and then died
+    async with sessionmaker() as session:
+        first = (
+            await session.scalars(
+                select(db.ModelInput).where(
+                    db.ModelInput.simulation_id == job.simulation_id,
+                    db.ModelInput.previous_model_input_id.is_(None),
+                )
+            )
+        ).one()
+        session.add(
+            db.ModelResult(
+                model_input_id=first.id,
+                phases=[
+                    {
+                        "kind": "co2-rich",
+                        "fraction": 1.0,
+                        "concentrations": {"H2O": 10},
+                    }
+                ],
+                panels=[],
+                error=None,
+            )
+        )
+        (await session.get_one(db.SimulationJob, job.id)).lease_expires_at = (
+            datetime.now() - timedelta(seconds=1)
+        )
+        await session.commit()
+
+    reclaimed = await jobs.claim_job(sessionmaker, "worker-2")
+    assert reclaimed is not None
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+    await run_job(client.app_state, reclaimed, "worker-2", ADAPTERS)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "done"
+    assert result["results"][1]["phases"][0]["concentrations"] == {"H2O": 11}
+    assert CountingAdapter.runs == 1
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_job_loop_survives_lost_lease(client, sessionmaker, monkeypatch):
+    # Heartbeats every 0.5 s, after the other job has long finished
+    monkeypatch.setattr(SETTINGS, "acidwatch_job_lease_seconds", 1.5)
+    lost = _submit(client)
+    other = _submit(client, water=2)
+    started = asyncio.Event()
+    run = CountingAdapter.run
+
+    async def hang_on_first_job(self):
+        if self.concentrations["H2O"] == 1:
+            started.set()
+            await asyncio.sleep(60)
+        return await run(self)
+
+    monkeypatch.setattr(CountingAdapter, "run", hang_on_first_job)
+
+    async def job_done():
+        while True:
+            async with sessionmaker() as session:
+                job = (
+                    await session.scalars(
+                        select(db.SimulationJob).where(
+                            db.SimulationJob.simulation_id == UUID(other)
+                        )
+                    )
+                ).one()
+            if job.status == "done":
+                return
+            await asyncio.sleep(0.01)
+
+    async with _job_loop(client, monkeypatch) as loop:
+        await asyncio.wait_for(started.wait(), 5)
+        async with db.begin_session(sessionmaker) as session:
+            await session.execute(
+                update(db.SimulationJob)
+                .where(db.SimulationJob.simulation_id == UUID(lost))
+                .values(
+                    lease_owner="worker-2",
+                    lease_expires_at=datetime.now() + timedelta(hours=1),
+                )
+            )
+
+        await asyncio.wait_for(job_done(), 5)
+        assert not loop.done()
+
+    async with sessionmaker() as session:
+        job = (
+            await session.scalars(
+                select(db.SimulationJob).where(
+                    db.SimulationJob.simulation_id == UUID(lost)
+                )
+            )
+        ).one()
+    assert (job.status, job.lease_owner) == ("running", "worker-2")
+
+
+async def test_heartbeat_survives_renewal_errors(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_job_lease_seconds", 0.03)
+    renewals = iter([ConnectionError("Database unavailable"), False])
+
+    async def renew_lease(sessionmaker, job_id, owner):
+        outcome = next(renewals)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(jobs, "renew_lease", renew_lease)
+    runner = asyncio.create_task(asyncio.sleep(60))
+    await asyncio.wait_for(
+        models_route._keep_leases(None, [uuid4()], "worker-1", runner), 5
+    )
+
+    assert runner.cancelled() or runner.cancelling()
+
+
+@pytest.mark.usefixtures("counting_adapter", "external_worker")
+async def test_job_is_failed_after_too_many_attempts(client, sessionmaker, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_job_max_attempts", 0)
+    simulation_id = _submit(client)
+
+    job = await jobs.claim_job(sessionmaker, "worker-1")
+    assert job is not None
+    await run_job(client.app_state, job, "worker-1", ADAPTERS)
+
+    result = client.get_json(f"/simulations/{simulation_id}/result")
+    assert result["status"] == "error"
+    assert "abandoned" in result["error"]
+    assert CountingAdapter.runs == 0
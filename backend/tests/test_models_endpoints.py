@@ -1,4 +1,7 @@
+import asyncio
+import json
 from enum import StrEnum
+from uuid import UUID, uuid4
 
 from acidwatch_api.routes.models import get_adapters
 import pytest
@@ -6,10 +9,21 @@ from fastapi.testclient import TestClient as _BaseTestClient
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
 from acidwatch_api.app import fastapi_app
-from acidwatch_api.authentication import authenticated_user_claims
+from acidwatch_api.authentication import (
+    User,
+    authenticated_user_claims,
+    get_optional_current_user,
+)
+from acidwatch_api.model_catalogue import AccessCache, build_catalogue
+from acidwatch_api.routes import models as models_route
 from acidwatch_api.models import base
 from acidwatch_api.models.base import BaseParameters, Parameter
-from acidwatch_api.models.datamodel import JsonResult, Phase
+from acidwatch_api.models.datamodel import (
+    JsonResult,
+    Phase,
+    SimulationResult,
+    TextResult,
+)
 import acidwatch_api.database as db
 
 
@@ -35,6 +49,12 @@ def client(monkeypatch):
         yield c
 
 
+@pytest.fixture(autouse=True)
+def _clear_catalogue():
+    # Tests modify the adapter classes, which the catalogue assumes are static
+    build_catalogue.cache_clear()
+
+
 @pytest.fixture
 def sql_session(client):
     return client.app_state["session"]
@@ -121,6 +141,74 @@ def test_get_test_model(client):
     assert response[0]["modelId"] == "dummy"
 
 
+def test_get_models_revalidates_with_etag(client):
+    response = client.get("/models")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = client.get("/models", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/models", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+class ProtectedDummyAdapter(DummyAdapter):
+    model_id = "protected_dummy"
+    authentication = True
+    scope = "api://protected/.default"
+
+
+class FakeTokens:
+    def __init__(self):
+        self.calls = []
+
+    async def acquire(self, scope, jwt_token):
+        self.calls.append((scope, jwt_token))
+        if jwt_token == "denied":
+            return {"error": "denied", "error_description": "No access"}
+        return {"access_token": "token"}
+
+
+@pytest.fixture
+def protected_model(client, monkeypatch):
+    tokens = FakeTokens()
+    monkeypatch.setattr(models_route, "obo_tokens", tokens)
+    monkeypatch.setattr(models_route, "_access_cache", AccessCache(60))
+    monkeypatch.setitem(
+        client.app.dependency_overrides,
+        get_adapters,
+        lambda: {
+            DummyAdapter.model_id: DummyAdapter,
+            ProtectedDummyAdapter.model_id: ProtectedDummyAdapter,
+        },
+    )
+    return tokens
+
+
+def _sign_in(client, monkeypatch, jwt_token):
+    monkeypatch.setitem(
+        client.app.dependency_overrides,
+        get_optional_current_user,
+        lambda: User(id=jwt_token, name="", principal_name="", jwt_token=jwt_token),
+    )
+
+
+def test_get_models_caches_access_checks(client, monkeypatch, protected_model):
+    _sign_in(client, monkeypatch, "allowed")
+    first = client.get("/models")
+    assert [m["accessError"] for m in first.json()] == [None, None]
+    client.get("/models")
+    assert protected_model.calls == [("api://protected/.default", "allowed")]
+
+    _sign_in(client, monkeypatch, "denied")
+    second = client.get("/models")
+    assert [m["accessError"] for m in second.json()] == [None, "No access"]
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert len(protected_model.calls) == 2
+
+
 def _make_phases(concentrations: dict[str, int | float]) -> list[dict]:
     return [{"kind": "co2-rich", "fraction": 1.0, "concentrations": concentrations}]
 
@@ -432,6 +520,12 @@ def test_running_models(client, input_models, result_concentrations):
         ],
     }
 
+    assert client.get_json(f"/simulations/{simulation_id}/status") == {
+        "status": "done",
+        "completedSteps": len(input_models),
+        "totalSteps": len(input_models),
+    }
+
 
 @pytest.mark.parametrize(
     "input_models,result",
@@ -475,6 +569,159 @@ def test_failing_model(client, input_models, result):
     assert data["status"] == "error"
     assert "Intentional failure for testing" in data["error"]
 
+    status = client.get_json(f"/simulations/{simulation_id}/status")
+    assert status["status"] == "error"
+
+
+def test_status_of_unknown_simulation(client):
+    response = client.get(f"/simulations/{uuid4()}/status")
+    assert response.status_code == 404
+
+
+def test_result_of_unknown_simulation(client):
+    response = client.get(f"/simulations/{uuid4()}/result")
+    assert response.status_code == 404
+
+
+async def test_finished_result_is_an_immutable_snapshot(
+    client, sql_session, dummy_model
+):
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": 1},
+            "models": [{"modelId": dummy_model.model_id, "parameters": {}}],
+        },
+    )
+    response.raise_for_status()
+    simulation_id = UUID(response.json())
+
+    async with sql_session() as session:
+        simulation = await session.get_one(db.Simulation, simulation_id)
+        assert simulation.result_snapshot is not None
+        etag = simulation.result_etag
+
+    response = client.get(f"/simulations/{simulation_id}/result")
+    assert response.status_code == 200
+    assert response.json()["status"] == "done"
+    assert response.headers["ETag"] == etag
+    assert "immutable" in response.headers["Cache-Control"]
+    # Encoded exactly like the pydantic model would be
+    assert (
+        response.content
+        == SimulationResult.model_validate_json(response.content)
+        .model_dump_json(by_alias=True)
+        .encode()
+    )
+
+    response = client.get(
+        f"/simulations/{simulation_id}/result", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Simulations that finished before snapshots existed get one when read
+    async with db.begin_session(sql_session) as session:
+        simulation = await session.get_one(db.Simulation, simulation_id)
+        simulation.result_snapshot = simulation.result_etag = None
+
+    response = client.get(f"/simulations/{simulation_id}/result")
+    assert response.headers["ETag"] == etag
+    async with sql_session() as session:
+        simulation = await session.get_one(db.Simulation, simulation_id)
+        assert simulation.result_etag == etag
+
+
+def test_panels_are_fetched_on_demand(client, monkeypatch, dummy_model):
+    async def run(self):
+        return [
+            Phase(kind="co2-rich", fraction=1.0, concentrations=self.concentrations)
+        ], TextResult(label="log", data="x" * 1000)
+
+    monkeypatch.setattr(dummy_model, "run", run)
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": 1},
+            "models": [{"modelId": dummy_model.model_id, "parameters": {}}],
+        },
+    )
+    response.raise_for_status()
+    simulation_id = response.json()
+
+    full = client.get(f"/simulations/{simulation_id}/result")
+    response = client.get(f"/simulations/{simulation_id}/result?panels=descriptors")
+    assert response.status_code == 200
+    assert response.headers["ETag"] != full.headers["ETag"]
+    (descriptor,) = response.json()["results"][0]["panels"]
+    response = client.get(
+        f"/simulations/{simulation_id}/result?panels=descriptors",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+    panel = client.get(f"/simulations/{simulation_id}/steps/0/panels/0")
+    assert panel.json() == full.json()["results"][0]["panels"][0]
+    assert descriptor == {"type": "text", "label": "log", "size": len(panel.content)}
+    with client.stream(
+        "GET", f"/simulations/{simulation_id}/events?panels=descriptors"
+    ) as response:
+        data = [line for line in response.iter_lines() if line.startswith("data: ")]
+    assert json.loads(data[0].removeprefix("data: "))["result"]["panels"] == [
+        descriptor
+    ]
+    for path in ["steps/0/panels/1", "steps/1/panels/0", "steps/-1/panels/0"]:
+        response = client.get(f"/simulations/{simulation_id}/{path}")
+        assert response.status_code == 404
+    response = client.get(f"/simulations/{uuid4()}/steps/0/panels/0")
+    assert response.status_code == 404
+
+
+def test_events_of_finished_simulation(client, dummy_model):
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": 1},
+            "models": [{"modelId": dummy_model.model_id, "parameters": {}}],
+        },
+    )
+    response.raise_for_status()
+
+    with client.stream("GET", f"/simulations/{response.json()}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        lines = [line for line in response.iter_lines() if line]
+
+    assert lines == [
+        "event: result",
+        'data: {"step":0,"position":null,"result":{"phases":'
+        + json.dumps(_make_phases({"H2O": 0.5}), separators=(",", ":"))
+        + ',"panels":[]},"error":null}',
+        "event: status",
+        'data: {"status":"done","completedSteps":1,"totalSteps":1}',
+    ]
+
+
+def test_events_of_unknown_simulation(client):
+    response = client.get(f"/simulations/{uuid4()}/events")
+    assert response.status_code == 404
+
+
+def test_pending_result_is_not_cached(client, dummy_model, monkeypatch):
+    monkeypatch.setattr(models_route.SETTINGS, "acidwatch_inline_worker", False)
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": 1},
+            "models": [{"modelId": dummy_model.model_id, "parameters": {}}],
+        },
+    )
+    response.raise_for_status()
+
+    response = client.get(f"/simulations/{response.json()}/result")
+    assert response.json()["status"] == "pending"
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"] == "no-cache"
+
 
 @pytest.mark.parametrize(
     "swap",
@@ -483,7 +730,7 @@ def test_failing_model(client, input_models, result):
         pytest.param(True, id="reverse order"),
     ],
 )
-def test_results_order(client, sql_session, swap):
+async def test_results_order(client, sql_session, swap):
     first_model = {"modelId": "first_model", "parameters": {}}
     second_model = {"modelId": "second_model", "parameters": {}}
     first_result = {"phases": _make_phases({"A": 1}), "panels": []}
@@ -521,14 +768,14 @@ def test_results_order(client, sql_session, swap):
         ],
     )
 
-    with sql_session() as session:
+    async with sql_session() as session:
         session.add(simulation)
-        session.commit()
+        await session.commit()
 
         simulation.model_inputs[
             second
         ].previous_model_input_id = simulation.model_inputs[first].id
-        session.commit()
+        await session.commit()
 
     response = client.get(f"/simulations/{simulation.id}/result")
     response.raise_for_status()
@@ -543,3 +790,24 @@ def test_results_order(client, sql_session, swap):
         },
         "results": [first_result, second_result],
     }
+
+
+def test_model_exceeding_its_timeout_fails(client, monkeypatch, dummy_model):
+    async def run(self):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(dummy_model, "run", run)
+    monkeypatch.setattr(dummy_model, "timeout", 0.1)
+
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": {"H2O": 1},
+            "models": [{"modelId": dummy_model.model_id, "parameters": {}}],
+        },
+    )
+    response.raise_for_status()
+
+    result = client.get_json(f"/simulations/{response.json()}/result")
+    assert result["status"] == "error"
+    assert result["error"] == "TimeoutError: Dummy Model did not finish within 0.1s"
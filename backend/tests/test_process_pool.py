@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from acidwatch_api.models import base
+from acidwatch_api.models.datamodel import Phase
+from acidwatch_api.process_pool import ProcessPool
+
+
+class PidAdapter(base.BaseAdapter):
+    model_id = "pid"
+    display_name = "PID Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+    cpu_bound = True
+
+    async def run(self):
+        return [
+            Phase(
+                kind="co2-rich",
+                fraction=1.0,
+                concentrations={"PID": os.getpid(), **self.concentrations},
+            )
+        ]
+
+
+class FailingAdapter(PidAdapter):
+    async def run(self):
+        raise ValueError("Intentional failure for testing")
+
+
+class HangingAdapter(PidAdapter):
+    async def run(self):
+        time.sleep(60)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ProcessPool(1)
+    yield pool
+    pool.close()
+
+
+async def test_adapter_runs_in_warm_worker_process(pool):
+    adapter = PidAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+
+    first = await pool.run(adapter)
+    second = await pool.run(adapter)
+
+    assert first[0].concentrations["H2O"] == 2
+    assert first[0].concentrations["PID"] != os.getpid()
+    assert first[0].concentrations["PID"] == second[0].concentrations["PID"]
+
+
+async def test_batch_runs_in_worker_process(pool):
+    adapter = PidAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+
+    results = await pool.run_batch(adapter, [{"H2O": 1}, {"H2O": 3}])
+
+    assert [r[0].concentrations["H2O"] for r in results] == [1, 3]
+    assert results[0][0].concentrations["PID"] != os.getpid()
+
+
+async def test_worker_process_errors_are_raised(pool):
+    adapter = FailingAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+
+    with pytest.raises(ValueError, match="Intentional failure"):
+        await pool.run(adapter)
+
+    # The worker survives a failing adapter
+    adapter = PidAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+    assert (await pool.run(adapter))[0].concentrations["H2O"] == 2
+
+
+async def test_timed_out_worker_process_is_terminated(pool):
+    adapter = PidAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+    pid = (await pool.run(adapter))[0].concentrations["PID"]
+
+    hanging = HangingAdapter(concentrations={}, parameters=None, jwt_token=None)
+    with pytest.raises(TimeoutError):
+        await pool.run(hanging, timeout=0.5)
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid), 0)
+
+    # A fresh worker takes over
+    new_pid = (await pool.run(adapter))[0].concentrations["PID"]
+    assert new_pid != pid
+
+
+async def test_waiting_run_gets_a_new_worker_after_timeout():
+    pool = ProcessPool(1)
+    try:
+        hanging = HangingAdapter(concentrations={}, parameters=None, jwt_token=None)
+        adapter = PidAdapter(concentrations={"H2O": 2}, parameters=None, jwt_token=None)
+        timed_out, result = await asyncio.wait_for(
+            asyncio.gather(
+                pool.run(hanging, timeout=1),
+                pool.run(adapter),
+                return_exceptions=True,
+            ),
+            30,
+        )
+    finally:
+        pool.close()
+
+    assert isinstance(timed_out, TimeoutError)
+    assert result[0].concentrations["H2O"] == 2
@@ -0,0 +1,198 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select
+
+import acidwatch_api.database as db
+
+from acidwatch_api.app import fastapi_app
+from acidwatch_api.models import base
+from acidwatch_api.models.datamodel import Phase
+from acidwatch_api.result_cache import CacheEntry, MemoryCache, cache_key
+from acidwatch_api.routes.models import get_adapters, run_jobs
+from acidwatch_api.settings import SETTINGS
+
+
+class Parameters(base.BaseParameters):
+    factor: float = base.Parameter(1.0)
+
+
+class CountingAdapter(base.BaseAdapter):
+    model_id = "counting"
+    display_name = "Counting Model"
+    description = ""
+    category = "ChemicalEquilibrium"
+    valid_substances = ["H2O"]
+
+    parameters: Parameters
+    runs = 0
+    fail = False
+    delay = 0.0
+
+    async def run(self):
+        type(self).runs += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("Model failed")
+        return [
+            Phase(
+                kind="co2-rich",
+                fraction=1.0,
+                concentrations={
+                    key: value * self.parameters.factor
+                    for key, value in self.concentrations.items()
+                },
+            )
+        ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(CountingAdapter, "runs", 0)
+    fastapi_app.dependency_overrides[get_adapters] = lambda: {
+        CountingAdapter.model_id: CountingAdapter
+    }
+    with TestClient(fastapi_app) as c:
+        yield c
+    del fastapi_app.dependency_overrides[get_adapters]
+
+
+def _submit(client, concentrations, parameters=None):
+    response = client.post(
+        "/simulations",
+        json={
+            "concentrations": concentrations,
+            "models": [{"modelId": "counting", "parameters": parameters or {}}],
+        },
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _run(client, concentrations, parameters=None):
+    simulation_id = _submit(client, concentrations, parameters)
+    return client.get(f"/simulations/{simulation_id}/result").json()
+
+
+def _adapter(concentrations=None, **parameters):
+    return CountingAdapter(
+        concentrations=concentrations or {"H2O": 1},
+        parameters=parameters,
+        jwt_token=None,
+    )
+
+
+def test_cache_key_ignores_passthrough_and_number_type():
+    a = _adapter()
+    a.set_concentrations({"H2O": 1, "SO2": 5})
+    b = _adapter({"H2O": 1.0})
+    assert cache_key(a) == cache_key(b)
+
+
+def test_cache_key_depends_on_inputs(monkeypatch):
+    key = cache_key(_adapter())
+    assert cache_key(_adapter(factor=2)) != key
+
+    monkeypatch.setattr(CountingAdapter, "version", "2")
+    assert cache_key(_adapter()) != key
+
+
+def test_identical_run_is_served_from_cache(client):
+    first = _run(client, {"H2O": 2})
+    second = _run(client, {"H2O": 2.0})
+
+    assert CountingAdapter.runs == 1
+    assert first["status"] == second["status"] == "done"
+    assert first["results"] == second["results"]
+
+
+def test_different_parameters_are_not_served_from_cache(client):
+    _run(client, {"H2O": 2})
+    result = _run(client, {"H2O": 2}, {"factor": 3})
+
+    assert CountingAdapter.runs == 2
+    assert result["results"][0]["phases"][0]["concentrations"] == {"H2O": 6}
+
+
+def test_errors_are_not_cached(client, monkeypatch):
+    monkeypatch.setattr(CountingAdapter, "fail", True)
+    assert _run(client, {"H2O": 2})["status"] == "error"
+    monkeypatch.setattr(CountingAdapter, "fail", False)
+    assert _run(client, {"H2O": 2})["status"] == "done"
+
+    assert CountingAdapter.runs == 2
+
+
+async def test_memory_hit_does_not_touch_the_database(client):
+    _run(client, {"H2O": 2})
+    async with client.app_state["session"]() as session:
+        await session.execute(delete(db.CachedResult))
+        await session.commit()
+
+    _run(client, {"H2O": 2})
+    assert CountingAdapter.runs == 1
+
+
+async def test_concurrent_identical_runs_are_deduplicated(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "acidwatch_inline_worker", False)
+    monkeypatch.setattr(CountingAdapter, "delay", 0.05)
+    simulation_ids = [_submit(client, {"H2O": 2}) for _ in range(3)]
+
+    async with client.app_state["session"]() as session:
+        job_ids = list(await session.scalars(select(db.SimulationJob.id)))
+
+    await run_jobs(
+        client.app_state,
+        job_ids,
+        {CountingAdapter.model_id: CountingAdapter},
+        concurrency=3,
+    )
+
+    assert CountingAdapter.runs == 1
+    for simulation_id in simulation_ids:
+        result = client.get(f"/simulations/{simulation_id}/result").json()
+        assert result["status"] == "done"
+        assert result["results"][0]["phases"][0]["concentrations"] == {"H2O": 2}
+
+
+def _entry(value):
+    return CacheEntry(
+        phases=[
+            {"kind": "co2-rich", "fraction": 1.0, "concentrations": {"H2O": value}}
+        ],
+        panels=[],
+    )
+
+
+def test_memory_cache_evicts_least_recently_used():
+    probe = MemoryCache(1000, 60)
+    probe.put("probe", _entry(1))
+    cache = MemoryCache(probe.size * 2, 60)
+
+    cache.put("a", _entry(1))
+    cache.put("b", _entry(2))
+    assert cache.get("a") is not None
+    cache.put("c", _entry(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.size <= cache.max_bytes
+
+
+def test_memory_cache_skips_entries_larger_than_budget():
+    cache = MemoryCache(10, 60)
+    cache.put("a", _entry(1))
+    assert len(cache) == 0
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    cache = MemoryCache(1000, 60)
+    cache.put("a", _entry(1))
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("a") is None
+    assert cache.size == 0
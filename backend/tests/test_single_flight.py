@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from acidwatch_api.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_result():
+    flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*(flight.run("a", work) for _ in range(5)))
+
+    assert calls == 1
+    assert results == [(42, False)] + [(42, True)] * 4
+    assert len(flight) == 0
+
+
+async def test_sequential_calls_are_not_shared():
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def work():
+        return 1
+
+    assert await flight.run("a", work) == (1, False)
+    assert await flight.run("a", work) == (1, False)
+
+
+async def test_errors_are_shared():
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flight.run("a", work), flight.run("a", work), return_exceptions=True
+    )
+    assert [type(r) for r in results] == [ValueError, ValueError]
+
+
+async def test_cancelling_one_caller_does_not_cancel_the_others():
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 1
+
+    first = asyncio.create_task(flight.run("a", work))
+    second = asyncio.create_task(flight.run("a", work))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == (1, True)
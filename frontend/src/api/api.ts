@@ -1,11 +1,11 @@
 import * as z from "zod";
 import config from "@/configuration";
-import { SimulationResults } from "@/dto/SimulationResults";
+import { SimulationResults, SimulationStatus } from "@/dto/SimulationResults";
 import { ModelConfig } from "@/dto/FormConfig";
 import { ExperimentResult } from "@/dto/ExperimentResult";
 import { getAccessToken } from "@/services/auth";
 import { ModelInput } from "@/dto/ModelInput";
-import { CreateGridSimulation, GridSimulationResult } from "@/dto/GridSimulation";
+import { CreateGridSimulation, GridSimulationResult, GridSimulationStatus } from "@/dto/GridSimulation";
 
 type ApiRequestInit<Model = never> = Omit<RequestInit, "method"> & {
     params?: Record<string, any>;
@@ -104,6 +104,53 @@ async function apiRequest<Model extends z.ZodTypeAny>(
     }
 }
 
+async function* streamEvents(path: string): AsyncGenerator<{ event: string; data: unknown }> {
+    const response = await apiRequest("GET", path, {
+        headers: { Accept: "text/event-stream" },
+        responseReturn: true,
+    });
+    if (!response.ok || response.body === null) {
+        throw new Error(`Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+
+        buffer += value;
+        let end: number;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const lines = buffer.slice(0, end).split("\n");
+            buffer = buffer.slice(end + 2);
+
+            const event = lines.find((line) => line.startsWith("event:"))?.slice(6).trim() ?? "message";
+            const data = lines.filter((line) => line.startsWith("data:")).map((line) => line.slice(5).trim());
+            if (data.length > 0) {
+                yield { event, data: JSON.parse(data.join("\n")) };
+            }
+        }
+    }
+}
+
+// Wait until the simulation at 'path' is no longer pending. Polling the status
+// is cheap, so the event stream is only opened while it is still running.
+async function waitUntilFinished(path: string, statusModel: typeof SimulationStatus | typeof GridSimulationStatus) {
+    const { status } = await apiRequest("GET", `${path}/status`, { responseModel: statusModel });
+    if (status !== "pending") {
+        return;
+    }
+
+    // Only the status events are used, so leave the panels out of the results
+    for await (const { event, data } of streamEvents(`${path}/events?panels=descriptors`)) {
+        if (event === "status" && statusModel.parse(data).status !== "pending") {
+            return;
+        }
+    }
+    throw new ResultIsPending();
+}
+
 export const startSimulation = async (modelInput: ModelInput): Promise<string> => {
     return await apiRequest("POST", `/simulations`, {
         json: modelInput,
@@ -112,6 +159,8 @@ export const startSimulation = async (modelInput: ModelInput): Promise<string> =
 };
 
 export const getResultForSimulation = async (simulationId: string): Promise<SimulationResults> => {
+    await waitUntilFinished(`/simulations/${simulationId}`, SimulationStatus);
+
     const data = await apiRequest("GET", `/simulations/${simulationId}/result`, { responseModel: SimulationResults });
 
     if (data.status === "pending") {
@@ -129,6 +178,8 @@ export const startGridSimulation = async (grid: CreateGridSimulation): Promise<s
 };
 
 export const getGridSimulationResult = async (gridId: string): Promise<GridSimulationResult> => {
+    await waitUntilFinished(`/grid-simulations/${gridId}`, GridSimulationStatus);
+
     const data = await apiRequest("GET", `/grid-simulations/${gridId}/result`, { responseModel: GridSimulationResult });
 
     if (data.status === "pending") {
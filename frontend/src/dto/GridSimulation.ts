@@ -31,5 +31,13 @@ export const GridSimulationResult = z.object({
     status: z.enum(["done", "pending"]),
     axes: z.array(Axis),
     simulations: z.array(SimulationResults),
+    cursor: z.number(),
 });
 export type GridSimulationResult = z.infer<typeof GridSimulationResult>;
+
+export const GridSimulationStatus = z.object({
+    status: z.enum(["done", "pending"]),
+    completedSteps: z.number(),
+    totalSteps: z.number(),
+});
+export type GridSimulationStatus = z.infer<typeof GridSimulationStatus>;
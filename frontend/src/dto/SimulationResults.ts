@@ -54,3 +54,10 @@ export const SimulationResults = z.object({
     error: z.nullable(z.string()).optional(),
 });
 export type SimulationResults = z.infer<typeof SimulationResults>;
+
+export const SimulationStatus = z.object({
+    status: z.enum(["done", "pending", "error"]),
+    completedSteps: z.number(),
+    totalSteps: z.number(),
+});
+export type SimulationStatus = z.infer<typeof SimulationStatus>;